@@ -1,118 +1,66 @@
-from urllib.request import urlopen
-import gzip
-
 import os
 import os.path
-import datetime
-
-import numpy as np
-import pandas as pd
 
 import matplotlib.pyplot as plt
+import numpy as np
 
 import cartopy
 import cartopy.crs
 import cartopy.feature as cfeature
 
-plt.ion()
-
-
-def get_filtered_isd(data_dir, s_date=None, f_date=None, allow_download=True):
-    fname = "isd-history.csv"
-    target_file = os.path.join(data_dir, fname)
-
-    os.makedirs(data_dir, exist_ok=True)
-    if not os.path.exists(target_file) and allow_download:
-        url_target = "ftp://ftp.ncdc.noaa.gov/pub/data/noaa/isd-history.csv"
-        with open(target_file, "wb") as fout:
-            print(url_target)
-            fout.write(urlopen(url_target).read())
-
-    isd_history = pd.read_csv(target_file)
-    if s_date is not None:
-        isd_history = isd_history[isd_history["BEGIN"] < s_date]
-    if f_date is not None:
-        isd_history = isd_history[isd_history["END"] > f_date]
-
-    return isd_history
-
-
-def extract_date_time(row):
-    """"""
-    fmt_str = "%Y%m%d%H%M"
-    dt = datetime.datetime.strptime(row[15:27], fmt_str)
-    return dt, dt.year, dt.month, dt.day, dt.hour
-
-
-def extract_temperature(row):
-    t = int(row[87:92])
-    if t == 9999:
-        return (np.nan,)
-    return (t / 10,)
-
-
-def injest_file(fname):
-    with gzip.open(fname, "rt", encoding="ascii") as f:
-        data = [extract_date_time(ln) + extract_temperature(ln) for ln in f]
-
-    return pd.DataFrame(
-        data, columns=("datetime", "year", "month", "day", "hour", "T")
-    ).dropna().infer_dtypes()
-
-
-def get_hourly_data(
-    data_dir,
-    template,
-    years,
-    allow_download=True,
-    urlbase="ftp://ftp.ncdc.noaa.gov/pub/data/noaa/{year}",
-):
-
-    data_dir_template = os.path.join(data_dir, "{year}")
-    target_template = os.path.join(data_dir_template, template)
-    url_template = "/".join((urlbase, template))
-    data = []
-
-    for year in years:
-        os.makedirs(data_dir_template.format(year=year), exist_ok=True)
-
-        target_file = target_template.format(year=year)
-
-        if not os.path.exists(target_file) and allow_download:
-            url_target = url_template.format(year=year)
-            with open(target_file, "wb") as fout:
-                print(url_target)
-                fout.write(urlopen(url_target).read())
-
-        data.append(injest_file(target_file))
-    data = pd.concat(data)
-    data.set_index("datetime", inplace=True)
-    return data
+from isd_utils import (
+    StationIndex,
+    get_filtered_isd,
+    get_hourly_data,
+    ingest_stations,
+)
 
 
 class StationPicker:
-    def __init__(self, station_artist, data, data_path=None):
+    def __init__(self, station_artist, data, data_path=None, pick_radius=10):
         if data_path is None:
             data_path = os.path.expanduser("~/data_cache")
         self.data_path = data_path
         self.event = None
         self.data = data
         self.station_artist = station_artist
+        self.pick_radius = pick_radius
+        # clicks are resolved with the index rather than by the artist
+        # testing every point
+        self.index = StationIndex(data)
         self.cid = station_artist.figure.canvas.mpl_connect(
-            "pick_event", self._id_station
+            "button_press_event", self._id_station
         )
         self.station_templates = {}
         self.station_rows = {}
 
+    def _stations_near(self, event):
+        """Positions of the stations within pick_radius points of the click"""
+        # in pixels, the same as Line2D's pickradius
+        r = self.pick_radius * self.station_artist.figure.dpi / 72
+        trans = self.station_artist.axes.transData
+        # the box (in lon / lat) around the click, then the exact distance
+        (lon0, lat0), (lon1, lat1) = trans.inverted().transform(
+            [(event.x - r, event.y - r), (event.x + r, event.y + r)]
+        )
+        ind = self.index.query_bbox(
+            min(lat0, lat1), max(lat0, lat1), min(lon0, lon1), max(lon0, lon1)
+        )
+        xy = trans.transform(
+            np.column_stack([self.index.lon[ind], self.index.lat[ind]])
+        )
+        return ind[np.hypot(xy[:, 0] - event.x, xy[:, 1] - event.y) <= r]
+
     def _id_station(self, event):
-        print("HIT")
-        if event.artist is not self.station_artist:
+        if event.inaxes is not self.station_artist.axes:
             return True
+        print("HIT")
 
-        N = len(event.ind)
+        ind = self._stations_near(event)
+        N = len(ind)
         if not N:
             return True
-        for i in event.ind:
+        for i in ind:
             row = self.data.iloc[i]
             label = row["STATION NAME"]
             tmplate = "{USAF}-{WBAN:05d}-{{year}}.gz".format(**row)
@@ -124,7 +72,7 @@ class StationPicker:
         self.station_artist.figure.canvas.mpl_disconnect(self.cid)
         self.cid = None
 
-    def get_station_data(self, station_name, years):
+    def get_station_data(self, station_name, years, max_workers=None):
         """Get data from NOAA
 
         Parameters
@@ -134,6 +82,9 @@ class StationPicker:
             (see sp.station_templates.keys())
         years : list
            List of years to get data for
+        max_workers : int, optional
+           If given, fetch and parse the years concurrently with this
+           many workers
 
         Returns
         -------
@@ -141,7 +92,37 @@ class StationPicker:
             Only extracts the temperature, year, month, day, and hour
         """
         return get_hourly_data(
-            self.data_path, self.station_templates[station_name], years
+            self.data_path,
+            self.station_templates[station_name],
+            years,
+            max_workers=max_workers,
+        )
+
+    def get_stations_data(self, station_names, years, max_workers=None):
+        """Get data for several stations from NOAA in one go
+
+        Parameters
+        ----------
+        station_names : list of str
+            Names of stations you have clicked on
+            (see sp.station_templates.keys())
+        years : list
+           List of years to get data for
+        max_workers : int, optional
+           If given, fetch and parse all of the station-years
+           concurrently with this many workers
+
+        Returns
+        -------
+        DataFrame
+            Long format: the columns of `get_station_data` plus a
+            categorical 'station' column, sorted by datetime
+        """
+        return ingest_stations(
+            self.data_path,
+            {name: self.station_templates[name] for name in station_names},
+            years,
+            max_workers=max_workers,
         )
 
 
@@ -183,21 +164,23 @@ def plot_station_locations(fig, fih, pick_radius=10):
     ax.add_feature(lakes)
     ax.add_feature(states_provinces, edgecolor="gray")
     ax.add_feature(countries, edgecolor="gray")
-    (art,) = ax.plot("LON", "LAT", "o", data=fih, ms=5, picker=10)
+    (art,) = ax.plot("LON", "LAT", "o", data=fih, ms=5)
 
-    sp = StationPicker(art, fih)
+    sp = StationPicker(art, fih, pick_radius=pick_radius)
 
     return ax, art, sp
 
 
-data_path = os.path.expanduser("~/data_cache")
-fih = get_filtered_isd(data_path)
-fig = plt.figure()
-ax, art, sp = plot_station_locations(fig, fih)
+if __name__ == "__main__":
+    plt.ion()
+    data_path = os.path.expanduser("~/data_cache")
+    fih = get_filtered_isd(data_path)
+    fig = plt.figure()
+    ax, art, sp = plot_station_locations(fig, fih)
 
-# after finding a station by picking on the map:
-#
-# ithaca = sp.get_station_data("ITHACA TOMPKINS REGIONAL AIRPORT", range(2018, 2022))
-# central_park = sp.get_station_data("CENTRAL PARK", range(2018, 2022))
-# ithaca.to_hdf('data/ithaca.h5')
-# central_park.to_hdf('data/central_park.h5')
+    # after finding a station by picking on the map:
+    #
+    # ithaca = sp.get_station_data("ITHACA TOMPKINS REGIONAL AIRPORT", range(2018, 2022))
+    # central_park = sp.get_station_data("CENTRAL PARK", range(2018, 2022))
+    # ithaca.to_hdf('data/ithaca.h5')
+    # central_park.to_hdf('data/central_park.h5')
@@ -0,0 +1,91 @@
+"""Compare the aggregation engine to ``groupby(...).describe()``
+
+Usage::
+
+    python bench_aggregate.py [N_YEARS ...]
+
+Defaults to 1, 5, 10, 25, and 50 years of synthetic hourly data.
+"""
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from temperature_utils import aggregate_by_day, aggregate_by_month
+
+
+def synthetic_hourly(n_years, start_year=1970, seed=19680808):
+    """Generate hourly temperatures with the columns of `load_data`"""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(
+        f"{start_year}-01-01",
+        f"{start_year + n_years}-01-01",
+        freq="h",
+        inclusive="left",
+        name="datetime",
+    )
+    day_of_year = index.dayofyear.to_numpy()
+    T = (
+        10
+        - 12 * np.cos(2 * np.pi * day_of_year / 365.25)
+        - 4 * np.cos(2 * np.pi * index.hour.to_numpy() / 24)
+        + rng.normal(0, 3, len(index))
+    )
+    return pd.DataFrame(
+        {
+            "year": index.year,
+            "month": index.month,
+            "day": index.day,
+            "hour": index.hour,
+            "T": T,
+        },
+        index=index,
+    )
+
+
+def _describe_by(df, by):
+    # the implementation before the aggregation engine
+    return df.groupby(by)["T"].describe()
+
+
+def bench_aggregate(n_years=(1, 5, 10, 25, 50), repeat=3, reference=True):
+    """Time `aggregate_by_day` and `aggregate_by_month`
+
+    Parameters
+    ----------
+    n_years : list of int
+        The lengths of synthetic data to aggregate
+
+    repeat : int, optional
+        Number of times to run each aggregation, the best time is reported
+
+    reference : bool, optional
+        If the (slow) ``describe`` based aggregation should also be timed
+
+    Returns
+    -------
+    DataFrame
+        Indexed by number of years, best time in seconds for each function
+    """
+    cases = {
+        "by_day": (aggregate_by_day, ["year", "month", "day"]),
+        "by_month": (aggregate_by_month, ["year", "month"]),
+    }
+    rows = []
+    for n in n_years:
+        df = synthetic_hourly(n)
+        row = {"years": n, "rows": len(df)}
+        for name, (func, by) in cases.items():
+            row[name] = min(timeit.repeat(lambda: func(df), number=1, repeat=repeat))
+            if reference:
+                row[f"{name}_describe"] = min(
+                    timeit.repeat(lambda: _describe_by(df, by), number=1, repeat=1)
+                )
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("years")
+
+
+if __name__ == "__main__":
+    n_years = [int(n) for n in sys.argv[1:]] or (1, 5, 10, 25, 50)
+    print(bench_aggregate(n_years))
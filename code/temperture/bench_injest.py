@@ -0,0 +1,62 @@
+"""Compare the vectorized ISD parser to the per-line reference
+
+Usage::
+
+    python bench_injest.py [FILE.gz ...]
+
+If no files are given, every ISD file in ``~/data_cache`` is used.
+"""
+from pathlib import Path
+import sys
+import timeit
+
+import pandas as pd
+
+from isd_utils import injest_file, injest_file_by_line
+
+
+def bench_injest(fnames, repeat=3):
+    """Time `injest_file` against `injest_file_by_line`
+
+    Parameters
+    ----------
+    fnames : list of str or Path
+        The gzipped ISD files to parse
+
+    repeat : int, optional
+        Number of times to parse each file, the best time is reported
+
+    Returns
+    -------
+    DataFrame
+        Indexed by file name, the best time in seconds for each parser
+        and the speedup
+    """
+    rows = []
+    for fname in fnames:
+        # make sure the two paths agree before timing them
+        pd.testing.assert_frame_equal(
+            injest_file_by_line(fname).reset_index(drop=True),
+            injest_file(fname),
+            check_dtype=False,
+        )
+        by_line = min(
+            timeit.repeat(lambda: injest_file_by_line(fname), number=1, repeat=repeat)
+        )
+        vectorized = min(
+            timeit.repeat(lambda: injest_file(fname), number=1, repeat=repeat)
+        )
+        rows.append(
+            {
+                "file": Path(fname).name,
+                "by_line": by_line,
+                "vectorized": vectorized,
+                "speedup": by_line / vectorized,
+            }
+        )
+    return pd.DataFrame(rows).set_index("file")
+
+
+if __name__ == "__main__":
+    fnames = sys.argv[1:] or sorted(Path("~/data_cache").expanduser().glob("*/*.gz"))
+    print(bench_injest(fnames))
@@ -0,0 +1,48 @@
+"""Report the memory used by the full and compact hourly frames
+
+Usage::
+
+    python bench_memory.py [DATASET ...]
+
+Defaults to the bundled ``ithaca`` and ``central_park`` datasets.
+"""
+import sys
+
+import pandas as pd
+
+from temperature_utils import load_data
+
+
+def bench_memory(datasets=("ithaca", "central_park")):
+    """Measure `load_data` with and without ``compact=True``
+
+    Parameters
+    ----------
+    datasets : list of str
+        The datasets to load, see `load_data`
+
+    Returns
+    -------
+    DataFrame
+        Indexed by dataset, the number of rows, the size in MB of each
+        frame (including the index) and the ratio between them
+    """
+    rows = []
+    for dataset in datasets:
+        hourly = load_data(dataset)
+        full = hourly.memory_usage(deep=True).sum()
+        compact = load_data(dataset, compact=True).memory_usage(deep=True).sum()
+        rows.append(
+            {
+                "dataset": dataset,
+                "rows": len(hourly),
+                "full_MB": full / 1e6,
+                "compact_MB": compact / 1e6,
+                "ratio": full / compact,
+            }
+        )
+    return pd.DataFrame(rows).set_index("dataset")
+
+
+if __name__ == "__main__":
+    print(bench_memory(sys.argv[1:] or ("ithaca", "central_park")))
@@ -0,0 +1,337 @@
+"""Benchmark the temperature pipeline on synthetic ISD files
+
+Usage::
+
+    python bench_pipeline.py [--years N [N ...]] [--repeat R]
+                             [--output RESULTS.json] [--baseline OLD.json]
+                             [--threshold RATIO]
+
+For each number of years a synthetic station is written (one gzipped ISD
+file per year) and parsing, aggregation, extraction and picking on an Agg
+canvas are timed.  If a baseline (the output of a previous run) is given,
+any benchmark slower than it by more than the threshold is reported and
+the exit status is 1.
+"""
+import argparse
+import gzip
+import json
+from pathlib import Path
+import platform
+import sys
+import tempfile
+import timeit
+import warnings
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+from matplotlib.backend_bases import MouseEvent, PickEvent  # noqa: E402
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from isd_utils import (  # noqa: E402
+    DATETIME_COLS,
+    MISSING_TEMPERATURE,
+    TEMPERATURE_COLS,
+    get_hourly_data,
+    injest_file,
+)
+from temperature_utils import (  # noqa: E402
+    AggregatedTimeTrace,
+    aggregate_by_day,
+    aggregate_by_month,
+    extract_day_of_hourly,
+    extract_month_of_daily,
+    setup_temperature_figure,
+)
+
+# length of the mandatory section of an ISD record
+ISD_LINE_LENGTH = 105
+# the template of the synthetic station files
+SYNTHETIC_TEMPLATE = "999999-99999-{year}.gz"
+
+
+def _digits(values, width):
+    """The ASCII digits of non-negative integers as a (n, width) array"""
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    return (values[:, None] // powers % 10 + ord("0")).astype(np.uint8)
+
+
+def synthetic_isd_file(fname, year, reports_per_hour=2, missing=0.05, seed=19680808):
+    """Write a gzipped ISD file with a seasonal and daily temperature cycle
+
+    Only the fields read by `isd_utils.parse_isd_buffer` are meaningful,
+    the rest of each record is filled with zeros.
+
+    Parameters
+    ----------
+    fname : str or Path
+        The file to write
+
+    year : int
+        The year the observations are in
+
+    reports_per_hour : int, optional
+        Evenly spaced observations in each hour
+
+    missing : float, optional
+        The fraction of observations with a missing temperature
+
+    seed : int, optional
+        Combined with *year* to seed the random numbers
+
+    Returns
+    -------
+    int
+        The number of records written
+    """
+    rng = np.random.default_rng([seed, year])
+    times = pd.date_range(
+        f"{year}-01-01",
+        f"{year + 1}-01-01",
+        freq=f"{60 // reports_per_hour}min",
+        inclusive="left",
+    )
+    T = (
+        10
+        - 12 * np.cos(2 * np.pi * times.dayofyear.to_numpy() / 365.25)
+        - 4 * np.cos(2 * np.pi * times.hour.to_numpy() / 24)
+        + rng.normal(0, 3, len(times))
+    )
+    T = np.round(T * 10).astype(np.int64)
+    T[rng.random(len(times)) < missing] = MISSING_TEMPERATURE
+
+    records = np.full((len(times), ISD_LINE_LENGTH + 1), ord("0"), dtype=np.uint8)
+    records[:, -1] = ord("\n")
+    year, month, day, hour, minute = (
+        getattr(times, k).to_numpy(dtype=np.int64)
+        for k in ("year", "month", "day", "hour", "minute")
+    )
+    stamp = (((year * 100 + month) * 100 + day) * 100 + hour) * 100 + minute
+    records[:, slice(*DATETIME_COLS)] = _digits(stamp, 12)
+    t0, t1 = TEMPERATURE_COLS
+    records[:, t0] = np.where(T < 0, ord("-"), ord("+"))
+    records[:, t0 + 1 : t1] = _digits(np.abs(T), t1 - t0 - 1)
+    with gzip.open(fname, "wb") as f:
+        f.write(records.tobytes())
+    return len(records)
+
+
+def synthetic_station(data_dir, n_years, start_year=1970, **kwargs):
+    """Write a synthetic station in the layout used by `get_hourly_data`
+
+    Parameters
+    ----------
+    data_dir : str or Path
+        Files are written to data_dir/{year}/`SYNTHETIC_TEMPLATE`
+
+    n_years : int
+        The number of years to write
+
+    start_year : int, optional
+        The first year
+
+    **kwargs
+        Passed to `synthetic_isd_file`
+
+    Returns
+    -------
+    list of Path
+        The files written
+    """
+    fnames = []
+    for year in range(start_year, start_year + n_years):
+        fname = Path(data_dir) / str(year) / SYNTHETIC_TEMPLATE.format(year=year)
+        fname.parent.mkdir(parents=True, exist_ok=True)
+        synthetic_isd_file(fname, year, **kwargs)
+        fnames.append(fname)
+    return fnames
+
+
+def _best(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def _pick(artist, ind, key=None):
+    """Process a pick of the points *ind* of *artist* as if clicked"""
+    canvas = artist.figure.canvas
+    mouseevent = MouseEvent("button_press_event", canvas, 0, 0, 1, key=key)
+    mouseevent.inaxes = artist.axes
+    canvas.callbacks.process(
+        "pick_event", PickEvent("pick_event", canvas, mouseevent, artist, ind=ind)
+    )
+
+
+def _bench_picks(hourly, by_day, by_month, repeat, rng):
+    """Time picking a month and then a day of it, including the draw"""
+    fig, (yearly_ax, monthly_ax, daily_ax) = setup_temperature_figure()
+    trace = AggregatedTimeTrace(
+        hourly, "bench", yearly_ax, monthly_ax, daily_ax, by_day, by_month
+    )
+    fig.canvas.draw()
+    month_times, day_times = [], []
+    # a different month each time so nothing is served from the caches
+    months = rng.choice(len(by_month), size=min(repeat, len(by_month)), replace=False)
+    for i in months:
+        start = timeit.default_timer()
+        _pick(trace.yearly_art[0][0], [i])
+        fig.canvas.draw()
+        month_times.append(timeit.default_timer() - start)
+
+        (label,) = trace.daily_artists
+        month_line = trace.daily_artists[label][0][0]
+        start = timeit.default_timer()
+        _pick(month_line, [0])
+        fig.canvas.draw()
+        day_times.append(timeit.default_timer() - start)
+
+        # clear the month and day again so every pick starts from the same state
+        with warnings.catch_warnings():
+            # the legends of the emptied axes
+            warnings.filterwarnings("ignore", "No artists with labels")
+            for arts in list(trace.hourly_artiists.values()):
+                _pick(arts[0], [0])
+            _pick(month_line, [0], key="shift")
+    trace.remove()
+    plt.close(fig)
+    return min(month_times), min(day_times)
+
+
+def bench_pipeline(n_years=(1, 5, 20), repeat=3, data_dir=None, n_lookups=50):
+    """Time each stage of the pipeline on synthetic stations
+
+    Parameters
+    ----------
+    n_years : list of int
+        The lengths of the synthetic stations
+
+    repeat : int, optional
+        Number of times to run each benchmark, the best time is reported
+
+    data_dir : str or Path, optional
+        Where to write the synthetic files, defaults to a temporary
+        directory that is removed afterwards
+
+    n_lookups : int, optional
+        The number of random days / months to extract, the time per
+        lookup is reported
+
+    Returns
+    -------
+    list of dict
+        One record per benchmark and size with the keys {'benchmark',
+        'years', 'rows', 'seconds'}
+    """
+    if data_dir is None:
+        with tempfile.TemporaryDirectory() as tmp:
+            return bench_pipeline(n_years, repeat, tmp, n_lookups)
+
+    results = []
+    rng = np.random.default_rng(19680808)
+    for n in n_years:
+        station_dir = Path(data_dir) / f"{n}_years"
+        fnames = synthetic_station(station_dir, n)
+        hourly = get_hourly_data(
+            str(station_dir),
+            SYNTHETIC_TEMPLATE,
+            range(1970, 1970 + n),
+            allow_download=False,
+            use_cache=False,
+        )
+        by_day = aggregate_by_day(hourly)
+        by_month = aggregate_by_month(hourly)
+        days = by_day.index[rng.integers(len(by_day), size=n_lookups)]
+        months = by_month.index[rng.integers(len(by_month), size=n_lookups)]
+
+        def extract_days():
+            for d in days:
+                extract_day_of_hourly(hourly, d.year, d.month, d.day)
+
+        def extract_months():
+            for m in months:
+                extract_month_of_daily(by_day, m.year, m.month)
+
+        timings = {
+            "injest": _best(lambda: [injest_file(f) for f in fnames], repeat),
+            "aggregate_by_day": _best(lambda: aggregate_by_day(hourly), repeat),
+            "aggregate_by_month": _best(lambda: aggregate_by_month(hourly), repeat),
+            "extract_day_of_hourly": _best(extract_days, repeat) / n_lookups,
+            "extract_month_of_daily": _best(extract_months, repeat) / n_lookups,
+        }
+        timings["pick_month"], timings["pick_day"] = _bench_picks(
+            hourly, by_day, by_month, repeat, rng
+        )
+        results.extend(
+            {"benchmark": name, "years": n, "rows": len(hourly), "seconds": seconds}
+            for name, seconds in timings.items()
+        )
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold=1.25):
+    """Compare benchmark results to those of an earlier run
+
+    Parameters
+    ----------
+    results, baseline : list of dict
+        Outputs of `bench_pipeline`
+
+    threshold : float, optional
+        A benchmark is a regression if it takes more than this many
+        times as long as in *baseline*
+
+    Returns
+    -------
+    DataFrame
+        Indexed on (benchmark, years) for the benchmarks in both, has
+        columns {'baseline', 'current', 'ratio', 'regression'}
+    """
+
+    def seconds(records):
+        return pd.DataFrame(records).set_index(["benchmark", "years"])["seconds"]
+
+    both = pd.concat(
+        {"baseline": seconds(baseline), "current": seconds(results)},
+        axis=1,
+        join="inner",
+    )
+    both["ratio"] = both["current"] / both["baseline"]
+    both["regression"] = both["ratio"] > threshold
+    return both
+
+
+def _environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "matplotlib": matplotlib.__version__,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of an earlier run")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args()
+
+    results = bench_pipeline(args.years, args.repeat)
+    print(pd.DataFrame(results).set_index(["benchmark", "years"]))
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(
+                {"environment": _environment(), "results": results}, fout, indent=1
+            )
+    if args.baseline:
+        with open(args.baseline) as fin:
+            baseline = json.load(fin)["results"]
+        comparison = compare_to_baseline(results, baseline, args.threshold)
+        print(comparison)
+        if comparison["regression"].any():
+            sys.exit(1)
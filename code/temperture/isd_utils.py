@@ -0,0 +1,958 @@
+"""Helpers to download and parse NOAA Integrated Surface Data (ISD)
+
+The ISD "full" format is fixed-width ASCII, one observation per line, see
+https://www.ncei.noaa.gov/data/global-hourly/doc/isd-format-document.pdf
+"""
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import urlparse
+from urllib.error import HTTPError
+from urllib.request import Request, url2pathname, urlopen
+import hashlib
+import gzip
+
+import os
+import os.path
+import datetime
+import zipfile
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# (start, stop) of the fixed-width fields we care about
+DATETIME_COLS = (15, 27)
+TEMPERATURE_COLS = (87, 92)
+# value used by ISD to mark a missing air temperature
+MISSING_TEMPERATURE = 9999
+# the columns returned by the parsers
+COLUMNS = ("datetime", "year", "month", "day", "hour", "T")
+# the smallest types that hold each column, see `compact_hourly`
+COMPACT_DTYPES = {
+    "year": np.int16,
+    "month": np.int8,
+    "day": np.int8,
+    "hour": np.int8,
+    "T": np.float32,
+}
+
+# downloads are streamed to disk in pieces of this many bytes
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# bump this when the output of `load_isd_history` changes
+ISD_HISTORY_VERSION = 1
+
+# mean radius of the Earth, used for distances between stations
+EARTH_RADIUS_KM = 6371.0
+
+# bump this when the output of `parse_isd_buffer` changes so that the
+# cached results get re-parsed
+PARSER_VERSION = 1
+# parsed results are cached next to the raw file with this suffix
+CACHE_SUFFIX = ".parsed.npz"
+
+
+def load_isd_history(fname):
+    """Load the station list with compact dtypes
+
+    The parsed table is cached (as a pickle next to *fname*) and re-used
+    until the size or mtime of *fname* or the version of pandas changes.
+
+    Parameters
+    ----------
+    fname : str or Path
+        The isd-history.csv file
+
+    Returns
+    -------
+    DataFrame
+        USAF is kept as a string (some have leading zeros), CTRY, STATE
+        and ICAO are categorical, the coordinates are float32 and BEGIN and
+        END are datetimes.
+    """
+    cache_file = f"{fname}.pkl"
+    st = os.stat(fname)
+    # pickles are only readable by the pandas that wrote them
+    key = (ISD_HISTORY_VERSION, pd.__version__, st.st_size, st.st_mtime_ns)
+    try:
+        cached = pd.read_pickle(cache_file)
+        if cached["key"] == key:
+            return cached["data"]
+    except Exception:
+        # missing, corrupt or unreadable, re-parse
+        pass
+
+    isd_history = pd.read_csv(
+        fname,
+        dtype={
+            "USAF": str,
+            "WBAN": np.int32,
+            "STATION NAME": str,
+            "CTRY": "category",
+            "STATE": "category",
+            "ICAO": "category",
+            "LAT": np.float32,
+            "LON": np.float32,
+            "ELEV(M)": np.float32,
+            "BEGIN": str,
+            "END": str,
+        },
+    )
+    for k in ("BEGIN", "END"):
+        isd_history[k] = pd.to_datetime(isd_history[k], format="%Y%m%d")
+
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    pd.to_pickle({"key": key, "data": isd_history}, tmp_file)
+    os.replace(tmp_file, cache_file)
+    return isd_history
+
+
+def _as_timestamp(date):
+    """Accept dates as YYYYMMDD integers (as in isd-history.csv) or date-likes"""
+    if isinstance(date, (int, np.integer)):
+        return pd.to_datetime(str(date), format="%Y%m%d")
+    return pd.Timestamp(date)
+
+
+def get_filtered_isd(
+    data_dir,
+    s_date=None,
+    f_date=None,
+    allow_download=True,
+    url="ftp://ftp.ncdc.noaa.gov/pub/data/noaa/isd-history.csv",
+    backend=None,
+):
+    """Get the list of stations active over a period
+
+    Parameters
+    ----------
+    data_dir : str
+        Local cache, isd-history.csv is downloaded here if needed
+
+    s_date, f_date : date-like or int, optional
+        Only keep stations that started before *s_date* and ended after
+        *f_date*.  Integers are taken as YYYYMMDD.
+
+    allow_download : bool, optional
+        If isd-history.csv should be downloaded if it is not in the cache
+
+    url : str, optional
+        Where to download isd-history.csv from
+
+    backend : object, optional
+        How to download, see `download`
+
+    Returns
+    -------
+    DataFrame
+        See `load_isd_history`
+    """
+    fname = "isd-history.csv"
+    target_file = os.path.join(data_dir, fname)
+
+    os.makedirs(data_dir, exist_ok=True)
+    if allow_download:
+        download(url, target_file, backend)
+
+    isd_history = load_isd_history(target_file)
+    if s_date is not None:
+        isd_history = isd_history[isd_history["BEGIN"] < _as_timestamp(s_date)]
+    if f_date is not None:
+        isd_history = isd_history[isd_history["END"] > _as_timestamp(f_date)]
+
+    return isd_history
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between points given in degrees"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _to_xyz(lat, lon):
+    """Positions on the unit sphere"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)]
+    )
+
+
+class StationIndex:
+    def __init__(self, isd_history):
+        """Spatial index of station locations
+
+        Build this once and re-use it for every query.  All of the
+        queries return positions (suitable for ``.iloc``) into
+        *isd_history*.  Stations without a location are never returned.
+
+        Parameters
+        ----------
+        isd_history : DataFrame
+            Must have columns {'LAT', 'LON'} in degrees
+        """
+        self.lat = isd_history["LAT"].to_numpy(dtype=float)
+        self.lon = isd_history["LON"].to_numpy(dtype=float)
+        self._valid = np.flatnonzero(np.isfinite(self.lat) & np.isfinite(self.lon))
+        # the chord length between points on the sphere is monotonic in
+        # the great-circle distance, so a euclidean tree is exact
+        self._tree = cKDTree(_to_xyz(self.lat[self._valid], self.lon[self._valid]))
+        # for bounding box queries
+        order = np.argsort(self.lat[self._valid], kind="stable")
+        self._by_lat = self._valid[order]
+        self._sorted_lat = self.lat[self._by_lat]
+
+    def __len__(self):
+        return len(self._valid)
+
+    def query_nearest(self, lat, lon, k=1):
+        """The *k* stations closest to (*lat*, *lon*), nearest first"""
+        k = min(k, len(self))
+        if not k:
+            return np.array([], dtype=int)
+        _, ind = self._tree.query(_to_xyz(lat, lon)[0], k=k)
+        return self._valid[np.atleast_1d(ind)]
+
+    def query_radius(self, lat, lon, radius_km):
+        """The stations within *radius_km* of (*lat*, *lon*), nearest first"""
+        angle = min(radius_km / EARTH_RADIUS_KM, np.pi)
+        chord = 2 * np.sin(angle / 2)
+        ind = self._valid[self._tree.query_ball_point(_to_xyz(lat, lon)[0], chord)]
+        dist = haversine_km(lat, lon, self.lat[ind], self.lon[ind])
+        return ind[np.argsort(dist, kind="stable")]
+
+    def query_bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """The stations inside a latitude / longitude box, in input order
+
+        If *lon_min* > *lon_max* the box is taken to cross the
+        anti-meridian.
+        """
+        i0 = np.searchsorted(self._sorted_lat, lat_min, side="left")
+        i1 = np.searchsorted(self._sorted_lat, lat_max, side="right")
+        ind = self._by_lat[i0:i1]
+        lon = self.lon[ind]
+        if lon_min <= lon_max:
+            ind = ind[(lon >= lon_min) & (lon <= lon_max)]
+        else:
+            ind = ind[(lon >= lon_min) | (lon <= lon_max)]
+        return np.sort(ind)
+
+
+def extract_date_time(row):
+    """"""
+    fmt_str = "%Y%m%d%H%M"
+    dt = datetime.datetime.strptime(row[15:27], fmt_str)
+    return dt, dt.year, dt.month, dt.day, dt.hour
+
+
+def extract_temperature(row):
+    t = int(row[87:92])
+    if t == 9999:
+        return (np.nan,)
+    return (t / 10,)
+
+
+def injest_file_by_line(fname):
+    """Parse a gzipped ISD file one line at a time
+
+    This is the simple reference implementation, see `injest_file` for the
+    one to use.
+    """
+    with gzip.open(fname, "rt", encoding="ascii") as f:
+        data = [extract_date_time(ln) + extract_temperature(ln) for ln in f]
+
+    return (
+        pd.DataFrame(data, columns=COLUMNS)
+        .dropna()
+        .infer_objects()
+    )
+
+
+def _digits_to_int(digits):
+    """Convert an (N, k) array of ASCII digits to an (N,) array of int64"""
+    powers = 10 ** np.arange(digits.shape[1] - 1, -1, -1, dtype=np.int64)
+    return (digits.astype(np.int64) - ord("0")) @ powers
+
+
+def _fixed_width_columns(buf, start, stop):
+    """Slice the same columns out of every line of *buf*
+
+    Parameters
+    ----------
+    buf : bytes
+        The newline delimited records
+
+    start, stop : int
+        The columns to extract
+
+    Returns
+    -------
+    ndarray
+        (n_lines, stop - start) array of uint8
+    """
+    raw = np.frombuffer(buf, dtype=np.uint8)
+    if not len(raw):
+        return np.empty((0, stop - start), dtype=np.uint8)
+    line_ends = np.flatnonzero(raw == ord("\n"))
+    if raw[-1] != ord("\n"):
+        line_ends = np.append(line_ends, len(raw))
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+    if np.any(line_ends - line_starts < stop):
+        raise ValueError(f"Found lines shorter than {stop} characters")
+    return raw[line_starts[:, None] + np.arange(start, stop)]
+
+
+def compact_hourly(df):
+    """Store the hourly columns in the smallest types that hold them
+
+    The calendar columns become small integers and 'T' (which has a
+    resolution of 0.1 degree) becomes float32, which takes about a third
+    of the memory of the int64 / float64 columns.
+
+    Parameters
+    ----------
+    df : DataFrame
+        Has (some of) the columns in `COMPACT_DTYPES`
+
+    Returns
+    -------
+    DataFrame
+        A copy with the columns converted, other columns are unchanged
+    """
+    return df.astype({k: v for k, v in COMPACT_DTYPES.items() if k in df.columns})
+
+
+def parse_isd_buffer(buf, compact=False):
+    """Parse the date and temperature out of a block of ISD records
+
+    Rather than parsing each line in Python, the fixed-width columns of
+    every line are sliced out as one 2D array of bytes and converted
+    with vectorized integer arithmetic.
+
+    Parameters
+    ----------
+    buf : bytes
+        The decompressed content of an ISD file
+
+    compact : bool, optional
+        If True, return the columns in the types of `COMPACT_DTYPES`
+
+    Returns
+    -------
+    DataFrame
+        Has columns {'datetime', 'year', 'month', 'day', 'hour', 'T'},
+        observations with missing temperature are dropped.
+    """
+    # YYYYMMDDHHMM
+    stamp = _fixed_width_columns(buf, *DATETIME_COLS)
+    year = _digits_to_int(stamp[:, 0:4])
+    month = _digits_to_int(stamp[:, 4:6])
+    day = _digits_to_int(stamp[:, 6:8])
+    hour = _digits_to_int(stamp[:, 8:10])
+    minute = _digits_to_int(stamp[:, 10:12])
+
+    # [+-]TTTT in tenths of a degree
+    temp = _fixed_width_columns(buf, *TEMPERATURE_COLS)
+    sign = np.where(temp[:, 0] == ord("-"), -1, 1)
+    T = sign * _digits_to_int(temp[:, 1:])
+    good = T != MISSING_TEMPERATURE
+
+    year, month, day, hour, minute, T = (
+        v[good] for v in (year, month, day, hour, minute, T)
+    )
+    dt = (
+        (year - 1970).astype("datetime64[Y]").astype("datetime64[M]")
+        + (month - 1).astype("timedelta64[M]")
+    ).astype("datetime64[m]")
+    dt += (day - 1).astype("timedelta64[D]")
+    dt += hour.astype("timedelta64[h]")
+    dt += minute.astype("timedelta64[m]")
+
+    df = pd.DataFrame(
+        {
+            "datetime": dt.astype("datetime64[ns]"),
+            "year": year,
+            "month": month,
+            "day": day,
+            "hour": hour,
+            "T": T / 10,
+        }
+    )
+    return compact_hourly(df) if compact else df
+
+
+def injest_file(fname, compact=False):
+    """Parse a gzipped ISD file
+
+    Parameters
+    ----------
+    fname : str or Path
+        The file to read
+
+    compact : bool, optional
+        If True, return the columns in the types of `COMPACT_DTYPES`
+
+    Returns
+    -------
+    DataFrame
+        Has columns {'datetime', 'year', 'month', 'day', 'hour', 'T'}
+    """
+    with gzip.open(fname, "rb") as f:
+        return parse_isd_buffer(f.read(), compact=compact)
+
+
+def iter_injest_file(fname, chunk_bytes=None):
+    """Parse a gzipped ISD file in bounded-size pieces
+
+    The decompressed data is read in blocks of *chunk_bytes*, each block
+    is cut after its last complete line and the rest is carried over to
+    the next, so every chunk is parsed with `parse_isd_buffer`.
+
+    Parameters
+    ----------
+    fname : str or Path
+        The file to read
+
+    chunk_bytes : int, optional
+        The number of decompressed bytes to read at once, a chunk is at
+        most this plus one line long.  If not given the whole file is
+        parsed as one chunk.
+
+    Yields
+    ------
+    DataFrame
+        Has columns {'datetime', 'year', 'month', 'day', 'hour', 'T'}
+    """
+    with gzip.open(fname, "rb") as f:
+        if chunk_bytes is None:
+            yield parse_isd_buffer(f.read())
+            return
+        rest = b""
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            buf = rest + block
+            end = buf.rfind(b"\n") + 1
+            rest = buf[end:]
+            if end:
+                yield parse_isd_buffer(buf[:end])
+        if rest:
+            # the last line has no newline
+            yield parse_isd_buffer(rest)
+
+
+def _cache_key(fname):
+    st = os.stat(fname)
+    return np.array([PARSER_VERSION, st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+
+def _read_cache(cache_file, key=None):
+    """Load a cached parse, returns None if missing, corrupt or *key* does not match"""
+    try:
+        with np.load(cache_file) as cached:
+            if key is not None and not np.array_equal(cached["key"], key):
+                return None
+            return pd.DataFrame({k: cached[k] for k in COLUMNS})
+    except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+        return None
+
+
+def injest_file_cached(fname):
+    """Parse a gzipped ISD file, re-using the result of previous parses
+
+    The parsed columns are stored next to *fname* (with `CACHE_SUFFIX`
+    appended) and are re-used as long as the size and mtime of *fname*
+    and `PARSER_VERSION` are unchanged.
+
+    Parameters
+    ----------
+    fname : str or Path
+        The file to read
+
+    Returns
+    -------
+    DataFrame
+        Has columns {'datetime', 'year', 'month', 'day', 'hour', 'T'}
+    """
+    cache_file = str(fname) + CACHE_SUFFIX
+    key = _cache_key(fname)
+    df = _read_cache(cache_file, key)
+    if df is not None:
+        # touch the entry so eviction is least-recently-used
+        os.utime(cache_file)
+        return df
+
+    df = injest_file(fname)
+    # write to a temporary file and rename so concurrent readers never
+    # see a partial entry
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as fout:
+        np.savez(fout, key=key, **{k: df[k].to_numpy() for k in COLUMNS})
+    os.replace(tmp_file, cache_file)
+    return df
+
+
+def parsed_cache_info(data_dir):
+    """Describe the cached parse results under *data_dir*
+
+    Parameters
+    ----------
+    data_dir : str or Path
+        The local data cache
+
+    Returns
+    -------
+    DataFrame
+        One row per entry with columns {'source', 'cache_file', 'bytes',
+        'last_used', 'valid'}, least recently used first.  An entry is
+        valid if the source file exists and has not changed since it was
+        parsed by the current `PARSER_VERSION`.
+    """
+    rows = []
+    for cache_file in Path(data_dir).rglob("*" + CACHE_SUFFIX):
+        source = Path(str(cache_file)[: -len(CACHE_SUFFIX)])
+        st = cache_file.stat()
+        try:
+            with np.load(cache_file) as cached:
+                valid = np.array_equal(cached["key"], _cache_key(source))
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+            valid = False
+        rows.append(
+            {
+                "source": str(source),
+                "cache_file": str(cache_file),
+                "bytes": st.st_size,
+                "last_used": pd.Timestamp(st.st_mtime, unit="s"),
+                "valid": valid,
+            }
+        )
+    columns = ["source", "cache_file", "bytes", "last_used", "valid"]
+    return (
+        pd.DataFrame(rows, columns=columns)
+        .sort_values("last_used")
+        .reset_index(drop=True)
+    )
+
+
+def prune_parsed_cache(data_dir, max_bytes):
+    """Evict cached parse results until they take at most *max_bytes*
+
+    Invalid entries are always removed, then the least recently used
+    entries until the total size fits.  The raw files are not touched.
+
+    Parameters
+    ----------
+    data_dir : str or Path
+        The local data cache
+
+    max_bytes : int
+        The size budget for the cached parse results
+
+    Returns
+    -------
+    list of str
+        The cache files that were removed
+    """
+    info = parsed_cache_info(data_dir)
+    # invalid entries are evicted first, then the oldest
+    info = info.sort_values(["valid", "last_used"], kind="stable")
+    total = info["bytes"].sum()
+    removed = []
+    for cache_file, nbytes, valid in zip(
+        info["cache_file"], info["bytes"], info["valid"]
+    ):
+        if valid and total <= max_bytes:
+            break
+        os.remove(cache_file)
+        total -= nbytes
+        removed.append(cache_file)
+    return removed
+
+
+class URLBackend:
+    """Download with `urllib.request.urlopen` (http(s), ftp, file URLs)
+
+    Partial downloads are resumed with a HTTP Range request guarded by
+    If-Range, so the server only sends the rest of the file if it is
+    unchanged.  Servers that ignore it (or protocols without it) start
+    over from the beginning.
+    """
+
+    def open(self, url, offset=0, validator=None):
+        """Open *url* for reading, starting at *offset* if possible
+
+        Parameters
+        ----------
+        url : str
+            What to read
+
+        offset : int, optional
+            Where to resume from
+
+        validator : str, optional
+            Identifies the version of the file the first *offset* bytes
+            came from, as returned by an earlier call.  Without it (or if
+            it does not match) the stream starts at 0.
+
+        Returns
+        -------
+        stream : file-like
+            Supports ``read(n)`` and ``close()``
+
+        start : int
+            The offset *stream* actually starts at, 0 or *offset*
+
+        total : int or None
+            The size of the whole file, if known
+
+        validator : str or None
+            Identifies the version of the file being read
+        """
+        request = Request(url)
+        if offset and validator:
+            request.add_header("Range", f"bytes={offset}-")
+            request.add_header("If-Range", validator)
+        try:
+            response = urlopen(request)
+        except HTTPError as e:
+            if e.code != 416:
+                raise
+            # the range is past the end, whatever we have is not a prefix
+            return self.open(url)
+        headers = response.headers
+        start = offset if getattr(response, "status", None) == 206 else 0
+        length = headers.get("Content-Length")
+        total = None if length is None else start + int(length)
+        # If-Range only accepts a strong ETag
+        validator = headers.get("ETag")
+        if validator is None or validator.startswith("W/"):
+            validator = headers.get("Last-Modified")
+        return response, start, total, validator
+
+
+class LocalBackend:
+    """Copy from a local mirror, *url* is a path or a ``file://`` URL
+
+    The size and mtime of the source are used as the validator.
+    """
+
+    def open(self, url, offset=0, validator=None):
+        """See `URLBackend.open`"""
+        if url.startswith("file://"):
+            url = url2pathname(urlparse(url).path)
+        stream = open(url, "rb")
+        st = os.fstat(stream.fileno())
+        current = f"{st.st_size}-{st.st_mtime_ns}"
+        start = offset if validator == current and offset <= st.st_size else 0
+        stream.seek(start)
+        return stream, start, st.st_size, current
+
+
+def _default_backend(url):
+    if "://" not in url or url.startswith("file://"):
+        return LocalBackend()
+    return URLBackend()
+
+
+def _remove(*fnames):
+    for fname in fnames:
+        if os.path.exists(fname):
+            os.remove(fname)
+
+
+def download(url, target_file, backend=None, sha256=None):
+    """Stream *url* to *target_file*
+
+    The data is written to ``target_file + ".part"`` in chunks of
+    `DOWNLOAD_CHUNK_SIZE` and only renamed to *target_file* once it is
+    complete, so an existing *target_file* is never partial.  If a
+    ``.part`` file is left over from an interrupted download it is
+    resumed, but only if the backend confirms that the source is the one
+    it was started from (the validator is kept in ``.part.info``).
+
+    Parameters
+    ----------
+    url : str
+        Where to get the data from
+
+    target_file : str or Path
+        Where to put it.  If it already exists nothing is done.
+
+    backend : object, optional
+        Has an ``open(url, offset, validator)`` method, see
+        `URLBackend.open`.  Defaults to `LocalBackend` for paths and
+        ``file://`` URLs and `URLBackend` otherwise.
+
+    sha256 : str, optional
+        The expected hex digest of the file
+
+    Returns
+    -------
+    str
+        *target_file*
+    """
+    target_file = str(target_file)
+    if os.path.exists(target_file):
+        return target_file
+    if backend is None:
+        backend = _default_backend(url)
+
+    part_file = target_file + ".part"
+    info_file = part_file + ".info"
+    offset, validator = 0, None
+    if os.path.exists(part_file) and os.path.exists(info_file):
+        offset = os.path.getsize(part_file)
+        with open(info_file) as fin:
+            validator = fin.read() or None
+    print(url)
+    stream, start, total, validator = backend.open(url, offset, validator)
+    digest = hashlib.sha256()
+    try:
+        if not start:
+            with open(info_file, "w") as fout:
+                fout.write(validator or "")
+        with open(part_file, "r+b" if start else "wb") as fout:
+            if start:
+                # include what we already have in the checksum
+                while True:
+                    chunk = fout.read(DOWNLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+            while True:
+                chunk = stream.read(DOWNLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                fout.write(chunk)
+                digest.update(chunk)
+    finally:
+        stream.close()
+
+    size = os.path.getsize(part_file)
+    if total is not None and size != total:
+        # keep a partial file so the next attempt resumes, a file that is
+        # too long can never complete so start over
+        if size > total:
+            _remove(part_file, info_file)
+        raise OSError(f"Downloaded {size} of {total} bytes from {url}")
+    if sha256 is not None and digest.hexdigest() != sha256.lower():
+        _remove(part_file, info_file)
+        raise OSError(f"Checksum mismatch for {url}")
+    os.replace(part_file, target_file)
+    _remove(info_file)
+    return target_file
+
+
+def get_hourly_data(
+    data_dir,
+    template,
+    years,
+    allow_download=True,
+    urlbase="ftp://ftp.ncdc.noaa.gov/pub/data/noaa/{year}",
+    max_workers=None,
+    use_cache=True,
+    cache_max_bytes=None,
+    backend=None,
+):
+    """Get hourly temperature for one station over several years
+
+    Parameters
+    ----------
+    data_dir : str
+        Local cache, files are stored as ``data_dir/{year}/template``
+
+    template : str
+        File name of the station with a ``{year}`` placeholder
+
+    years : iterable of int
+        The years to get data for
+
+    allow_download : bool, optional
+        If files that are not in the local cache should be downloaded
+
+    urlbase : str, optional
+        Where to download from, with a ``{year}`` placeholder.  Anything
+        `urllib.request.urlopen` understands, or a local directory.
+
+    max_workers : int, optional
+        If given, download on a pool of this many threads while parsing
+        finished downloads on a pool of this many processes.  Otherwise
+        each year is downloaded and parsed in turn.
+
+    use_cache : bool, optional
+        If the parsed results should be cached next to the raw files, see
+        `injest_file_cached`
+
+    cache_max_bytes : int, optional
+        If given, prune the parsed results under *data_dir* to this size
+        once done, see `prune_parsed_cache`
+
+    backend : object, optional
+        How to download, see `download`
+
+    Returns
+    -------
+    DataFrame
+        Indexed on datetime, in year order
+    """
+    years = list(years)
+    data = _fetch_and_parse(
+        [_year_job(data_dir, template, urlbase, year) for year in years],
+        allow_download=allow_download,
+        max_workers=max_workers,
+        use_cache=use_cache,
+        backend=backend,
+    )
+
+    if cache_max_bytes is not None:
+        prune_parsed_cache(data_dir, cache_max_bytes)
+
+    data = pd.concat(data)
+    data.set_index("datetime", inplace=True)
+    return data
+
+
+def _year_job(data_dir, template, urlbase, year):
+    """The (url, local file) of one station-year, making the directory"""
+    os.makedirs(os.path.join(data_dir, str(year)), exist_ok=True)
+    return (
+        "/".join((urlbase, template)).format(year=year),
+        os.path.join(data_dir, str(year), template.format(year=year)),
+    )
+
+
+def _fetch_and_parse(jobs, allow_download, max_workers, use_cache, backend):
+    """Download (if needed) and parse a list of (url, local file)
+
+    Returns the parsed frames in the order of *jobs*.  If *max_workers*
+    is given the downloads run on a thread pool and each file is parsed
+    on a process pool as soon as it is on disk.
+    """
+    injest = injest_file_cached if use_cache else injest_file
+    if max_workers is None:
+        data = []
+        for url, target in jobs:
+            if allow_download:
+                download(url, target, backend)
+            data.append(injest(target))
+        return data
+
+    with ThreadPoolExecutor(max_workers) as fetchers, ProcessPoolExecutor(
+        max_workers
+    ) as parsers:
+        if allow_download:
+            fetched = {
+                fetchers.submit(download, url, target, backend): j
+                for j, (url, target) in enumerate(jobs)
+            }
+            # start parsing each file as soon as it is on disk
+            ready = ((fetched[fut], fut.result()) for fut in as_completed(fetched))
+        else:
+            ready = ((j, target) for j, (_, target) in enumerate(jobs))
+        parsed = {j: parsers.submit(injest, target) for j, target in ready}
+        return [parsed[j].result() for j in range(len(jobs))]
+
+
+def ingest_stations(
+    data_dir,
+    stations,
+    years,
+    allow_download=True,
+    urlbase="ftp://ftp.ncdc.noaa.gov/pub/data/noaa/{year}",
+    max_workers=None,
+    use_cache=True,
+    backend=None,
+):
+    """Get hourly temperature for many stations as one long-format frame
+
+    All of the station-years are fetched and parsed together (in
+    parallel if *max_workers* is given), and concatenated once.
+
+    Parameters
+    ----------
+    data_dir : str
+        Local cache, see `get_hourly_data`
+
+    stations : dict
+        Maps station label to file name template (with a ``{year}``
+        placeholder), for example ``StationPicker.station_templates``
+
+    years : iterable of int
+        The years to get data for
+
+    allow_download, urlbase, max_workers, use_cache, backend
+        See `get_hourly_data`
+
+    Returns
+    -------
+    DataFrame
+        Indexed on datetime (sorted, shared by all stations), has the
+        columns of `get_hourly_data` plus a categorical 'station' column.
+    """
+    years = list(years)
+    labels = list(stations)
+    jobs = [
+        _year_job(data_dir, stations[label], urlbase, year)
+        for label in labels
+        for year in years
+    ]
+    data = _fetch_and_parse(
+        jobs,
+        allow_download=allow_download,
+        max_workers=max_workers,
+        use_cache=use_cache,
+        backend=backend,
+    )
+    lengths = [len(df) for df in data]
+    data = pd.concat(data, ignore_index=True)
+    # build the categorical from codes rather than repeating strings
+    codes = np.repeat(np.arange(len(labels)), len(years))
+    data["station"] = pd.Categorical.from_codes(np.repeat(codes, lengths), labels)
+    data.set_index("datetime", inplace=True)
+    # the per-file pieces are already sorted, so this is a merge of runs
+    return data.sort_index(kind="stable")
+
+
+def iter_hourly_data(
+    data_dir,
+    template,
+    years,
+    allow_download=True,
+    urlbase="ftp://ftp.ncdc.noaa.gov/pub/data/noaa/{year}",
+    chunk_bytes=None,
+    backend=None,
+):
+    """Stream hourly temperature for one station over several years
+
+    This is the streaming equivalent of `get_hourly_data`, only one chunk
+    is held in memory at a time.  Files are downloaded as they are reached.
+
+    Parameters
+    ----------
+    data_dir, template, years, allow_download, urlbase, backend
+        See `get_hourly_data`
+
+    chunk_bytes : int, optional
+        The number of decompressed bytes to parse at once, see
+        `iter_injest_file`.  If not given, each file is one chunk.
+
+    Yields
+    ------
+    DataFrame
+        Indexed on datetime, in year order
+    """
+    data_dir_template = os.path.join(data_dir, "{year}")
+    target_template = os.path.join(data_dir_template, template)
+    url_template = "/".join((urlbase, template))
+
+    for year in years:
+        os.makedirs(data_dir_template.format(year=year), exist_ok=True)
+        target_file = target_template.format(year=year)
+        if allow_download:
+            download(url_template.format(year=year), target_file, backend)
+        for chunk in iter_injest_file(target_file, chunk_bytes):
+            yield chunk.set_index("datetime")
@@ -1,11 +1,394 @@
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
 import datetime
+import json
+import os
 from pathlib import Path
 import itertools
+import time
+import weakref
 
 from cycler import cycler
+from matplotlib.container import Container
+import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
+from isd_utils import compact_hourly
+
+# bump this when the output of `aggregate_by_day` or `aggregate_by_month`
+# changes so that stored aggregates get re-computed
+AGGREGATE_VERSION = 2
+# the statistics computed by `aggregate_by_day` and `aggregate_by_month`
+AGGREGATE_STATS = ["count", "mean", "std", "min", "max"]
+# stored aggregates of data/{dataset}.h5 go in data/{dataset}{AGGREGATE_SUFFIX}
+AGGREGATE_SUFFIX = ".agg.h5"
+
+# first day-of-year slot of each month in an `HourlyCube`.  Every year has
+# 366 slots (Feb 29 is left empty in non-leap years) so that a slot is the
+# same calendar day in every year.
+_MONTH_START = np.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+_MONTH_STOP = np.append(_MONTH_START[1:], 366)
+# the (month, day) of each slot
+_SLOT_MONTH = np.repeat(np.arange(1, 13), _MONTH_STOP - _MONTH_START)
+_SLOT_DAY = np.arange(366) - _MONTH_START[_SLOT_MONTH - 1] + 1
+
+
+class ExtractCache:
+    def __init__(self, max_entries=64, max_bytes=None):
+        """Least-recently-used cache of DataFrames
+
+        Parameters
+        ----------
+        max_entries : int, optional
+            The maximum number of entries to keep
+
+        max_bytes : int, optional
+            If given, also evict entries to keep the total memory of the
+            cached frames below this
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        """Return the cached value of *key*, calling *compute()* on a miss"""
+        try:
+            value, _ = self._entries[key]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+        value = compute()
+        nbytes = int(value.memory_usage(index=True).sum())
+        self._entries[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None
+            and self.nbytes > self.max_bytes
+            and len(self._entries) > 1
+        ):
+            _, (_, old_nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= old_nbytes
+        return value
+
+    def discard(self, key):
+        """Drop the entry for *key* if there is one"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[1]
+
+    def clear(self):
+        """Drop all entries, the hit and miss counts are kept"""
+        self._entries.clear()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return (
+            f"<ExtractCache {len(self)}/{self.max_entries} entries, "
+            f"{self.nbytes} bytes, hits={self.hits} misses={self.misses}>"
+        )
+
+
+class LatencyRecorder:
+    def __init__(self, figure=None, maxlen=1024):
+        """Per-phase timing of interactive callbacks, from click to paint
+
+        Each callback is recorded as an *event* (for example
+        'pick_month') made up of timed *phases* (for example 'extract',
+        'plot', 'legend', 'draw_request').  The event is complete when the
+        canvas has painted: at the next ``draw_event`` of a watched figure,
+        or when `painted` is called (blitting does not emit a
+        ``draw_event``).  The time from the end of the callback to the
+        paint is recorded as the 'draw' phase.
+
+        Parameters
+        ----------
+        figure : Figure, optional
+            Figure to `watch` for draws
+
+        maxlen : int, optional
+            The number of most recent events to keep
+        """
+        self.records = deque(maxlen=maxlen)
+        self._current = None
+        self._pending = []
+        self._cids = weakref.WeakKeyDictionary()
+        if figure is not None:
+            self.watch(figure)
+
+    def __repr__(self):
+        return f"<LatencyRecorder {len(self.records)} events>"
+
+    def watch(self, figure):
+        """Complete the pending events when *figure* draws"""
+        if figure not in self._cids:
+            self._cids[figure] = figure.canvas.mpl_connect(
+                "draw_event", lambda event: self.painted()
+            )
+
+    def unwatch(self, figure):
+        cid = self._cids.pop(figure, None)
+        if cid is not None:
+            figure.canvas.mpl_disconnect(cid)
+
+    @contextmanager
+    def event(self, name):
+        """Time the callback run in the body of the ``with`` as *name*
+
+        Nested events are recorded as part of the outer one.
+        """
+        if self._current is not None:
+            yield self._current
+            return
+        event = {
+            "name": name,
+            "start": time.perf_counter(),
+            "phases": {},
+            "spans": [],
+            "painted": None,
+        }
+        self._current = event
+        try:
+            yield event
+        finally:
+            self._current = None
+            event["handled"] = time.perf_counter()
+            if event["painted"] is not None or "draw_request" not in event["phases"]:
+                self._finish(event)
+            else:
+                self._pending.append(event)
+
+    @contextmanager
+    def phase(self, name):
+        """Time the body of the ``with`` as phase *name* of the current event"""
+        event = self._current
+        if event is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stop = time.perf_counter()
+            event["phases"][name] = event["phases"].get(name, 0) + stop - start
+            event["spans"].append((name, start, stop))
+
+    def painted(self):
+        """Mark the current and pending events as painted"""
+        now = time.perf_counter()
+        if self._current is not None:
+            self._current["painted"] = now
+        pending, self._pending = self._pending, []
+        for event in pending:
+            event["painted"] = now
+            self._finish(event)
+
+    def _finish(self, event):
+        handled = event.pop("handled")
+        painted = event["painted"] or handled
+        if painted > handled:
+            event["phases"]["draw"] = painted - handled
+            event["spans"].append(("draw", handled, painted))
+        event["total"] = painted - event["start"]
+        self.records.append(event)
+
+    def summary(self, percentiles=(50, 90, 99)):
+        """Percentiles of the time of each phase of each kind of event
+
+        Returns
+        -------
+        DataFrame
+            Indexed on (event, phase), the phase 'total' is the time from
+            the start of the callback to the paint.  Has a 'count' column
+            and one column of seconds per percentile.
+        """
+        rows = [
+            (event["name"], phase, seconds)
+            for event in self.records
+            for phase, seconds in [*event["phases"].items(), ("total", event["total"])]
+        ]
+        df = pd.DataFrame(rows, columns=["event", "phase", "seconds"])
+        gb = df.groupby(["event", "phase"], sort=False)["seconds"]
+        out = gb.count().to_frame("count")
+        for p in percentiles:
+            out[f"p{p:g}"] = gb.quantile(p / 100)
+        return out
+
+    def to_json(self, fname):
+        """Write the recorded events as a list of JSON objects"""
+        with open(fname, "w") as fout:
+            json.dump(
+                [{k: v for k, v in e.items() if k != "spans"} for e in self.records],
+                fout,
+                indent=1,
+            )
+
+    def to_chrome_trace(self, fname):
+        """Write the events in the Chrome trace format
+
+        The file can be opened in chrome://tracing or https://ui.perfetto.dev
+        """
+        trace = []
+        for event in self.records:
+            spans = [(event["name"], event["start"], event["start"] + event["total"])]
+            for name, start, stop in spans + event["spans"]:
+                trace.append(
+                    {
+                        "name": name,
+                        "cat": event["name"],
+                        "ph": "X",
+                        "ts": start * 1e6,
+                        "dur": (stop - start) * 1e6,
+                        "pid": 0,
+                        "tid": 0,
+                    }
+                )
+        with open(fname, "w") as fout:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, fout)
+
+
+class PickDispatcher:
+    def __init__(self, figure):
+        """Route pick events to the handler registered for the picked artist
+
+        A single ``pick_event`` callback is connected to the figure, so the
+        cost of a pick does not grow with the number of artists (or
+        `AggregatedTimeTrace` instances) listening.
+
+        Parameters
+        ----------
+        figure : Figure
+            The figure to listen to
+        """
+        self.figure = figure
+        self._handlers = {}
+        self.cid = figure.canvas.mpl_connect("pick_event", self._on_pick)
+
+    @classmethod
+    def for_figure(cls, figure):
+        """Get the dispatcher for *figure*, creating it if needed"""
+        # kept on the figure so it lives (and is collected) with it
+        if not hasattr(figure, "_pick_dispatcher"):
+            figure._pick_dispatcher = cls(figure)
+        return figure._pick_dispatcher
+
+    def connect(self, artist, handler):
+        """Call *handler(event)* when *artist* is picked"""
+        self._handlers[artist] = handler
+
+    def disconnect(self, artist):
+        """Stop routing picks on *artist*"""
+        self._handlers.pop(artist, None)
+
+    def _on_pick(self, event):
+        handler = self._handlers.get(event.artist)
+        if handler is not None:
+            handler(event)
+
+    def __len__(self):
+        return len(self._handlers)
+
+
+def _flatten(artist):
+    if isinstance(artist, Container):
+        return artist.get_children()
+    return [artist]
+
+
+class BlitManager:
+    def __init__(self, figure):
+        """Redraw only a few artists on top of a cached background
+
+        Artists added to the manager are marked as animated so they are
+        not part of the background.  After every full draw (including
+        those caused by resizing the window) the background of each
+        managed axes is re-captured, `update` then restores it, draws the
+        animated artists (and legend) and blits just that axes.
+
+        Parameters
+        ----------
+        figure : Figure
+            The figure to manage
+        """
+        self.figure = figure
+        self.canvas = figure.canvas
+        self._backgrounds = {}
+        self._artists = {}
+        self._size = None
+        self.cid = self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    @classmethod
+    def for_figure(cls, figure):
+        """Get the manager for *figure*, creating it if needed"""
+        # kept on the figure so it lives (and is collected) with it
+        if not hasattr(figure, "_blit_manager"):
+            figure._blit_manager = cls(figure)
+        return figure._blit_manager
+
+    def add_axes(self, ax):
+        """Cache the background of *ax*"""
+        self._artists.setdefault(ax, [])
+
+    def add(self, artist):
+        """Draw *artist* (or the children of a container) on top"""
+        for art in _flatten(artist):
+            art.set_animated(True)
+            self._artists.setdefault(art.axes, []).append(art)
+
+    def discard(self, artist):
+        """Stop managing *artist* (or the children of a container)"""
+        for art in _flatten(artist):
+            arts = self._artists.get(art.axes, [])
+            if art in arts:
+                arts.remove(art)
+
+    def _on_draw(self, event):
+        self._size = self.canvas.get_width_height()
+        for ax in self._artists:
+            self._backgrounds[ax] = self.canvas.copy_from_bbox(ax.bbox)
+            self._draw_animated(ax)
+
+    def _draw_animated(self, ax):
+        for art in sorted(self._artists[ax], key=lambda a: a.get_zorder()):
+            ax.draw_artist(art)
+        if ax.legend_ is not None and ax.legend_.get_animated():
+            ax.draw_artist(ax.legend_)
+
+    def update(self, *axes):
+        """Redraw the animated artists of *axes*
+
+        Falls back to a full draw if there is no (valid) background.
+
+        Returns
+        -------
+        bool
+            True if the axes were blitted, False if a draw was requested
+        """
+        if (
+            not self.canvas.supports_blit
+            or self._size != self.canvas.get_width_height()
+            or any(ax not in self._backgrounds for ax in axes)
+        ):
+            self.canvas.draw_idle()
+            return False
+        for ax in axes:
+            self.canvas.restore_region(self._backgrounds[ax])
+            self._draw_animated(ax)
+            self.canvas.blit(ax.bbox)
+        self.canvas.flush_events()
+        return True
+
 
 class AggregatedTimeTrace:
     def __init__(
@@ -18,6 +401,10 @@ class AggregatedTimeTrace:
         agg_by_day=None,
         agg_by_month=None,
         style_cycle=None,
+        cache_size=64,
+        cache_bytes=None,
+        blit=False,
+        recorder=None,
     ):
         """Class to manage 3-levels of aggregated temperature
 
@@ -51,7 +438,22 @@ class AggregatedTimeTrace:
         style_cycle : Cycler, optional
             Style to use for plotting
 
+        cache_size, cache_bytes : int, optional
+            The number of extracted months and days (and optionally the
+            memory they use) to keep for re-use, see `ExtractCache`
+
+        blit : bool, optional
+            Only redraw the artists added or removed by clicking rather
+            than the whole figure, see `BlitManager`
+
+        recorder : LatencyRecorder, optional
+            If given, the time spent in each phase of the pick callbacks
+            is recorded to it
+
         """
+        # cache of extracted months / days, reset when the data is replaced
+        self.month_cache = ExtractCache(cache_size, cache_bytes)
+        self.day_cache = ExtractCache(cache_size, cache_bytes)
         # data
         self.data_by_hour = hourly_data
         if agg_by_day is None:
@@ -100,16 +502,62 @@ class AggregatedTimeTrace:
             **next(self.style_cycle),
         )
 
-        # pick methods
-        self.y_cid = self.yearly_ax.figure.canvas.mpl_connect(
-            "pick_event", self._yearly_on_pick
-        )
-        self.m_cid = self.yearly_ax.figure.canvas.mpl_connect(
-            "pick_event", self._monthly_on_pick
-        )
-        self.d_cid = self.yearly_ax.figure.canvas.mpl_connect(
-            "pick_event", self._daily_on_pick
-        )
+        # for fast redraws of the artists we add / remove
+        self.blitter = None
+        if blit:
+            self.blitter = BlitManager.for_figure(self.yearly_ax.figure)
+            for ax in (self.yearly_ax, self.monthly_ax, self.daily_ax):
+                self.blitter.add_axes(ax)
+
+        # optional timing of the callbacks
+        self.recorder = recorder
+        if recorder is not None:
+            recorder.watch(self.yearly_ax.figure)
+
+        # pick methods, routed by the artist that was picked
+        self.dispatcher = PickDispatcher.for_figure(self.yearly_ax.figure)
+        self.dispatcher.connect(self.yearly_art[0][0], self._yearly_on_pick)
+
+    @property
+    def data_by_hour(self):
+        return self._data_by_hour
+
+    @data_by_hour.setter
+    def data_by_hour(self, value):
+        self._data_by_hour = value
+        self.day_cache.clear()
+
+    @property
+    def data_by_day(self):
+        return self._data_by_day
+
+    @data_by_day.setter
+    def data_by_day(self, value):
+        self._data_by_day = value
+        self.month_cache.clear()
+
+    def _event(self, name):
+        """Record the time of a callback if there is a recorder"""
+        return nullcontext() if self.recorder is None else self.recorder.event(name)
+
+    def _phase(self, name):
+        """Record the time of a phase of a callback if there is a recorder"""
+        return nullcontext() if self.recorder is None else self.recorder.phase(name)
+
+    def _update_legend(self, ax):
+        with self._phase("legend"):
+            legend = ax.legend()
+            if self.blitter is not None:
+                legend.set_animated(True)
+
+    def _redraw(self, *axes):
+        """Ask for *axes* to be redrawn when convenient"""
+        with self._phase("draw_request"):
+            if self.blitter is None:
+                self.yearly_ax.figure.canvas.draw_idle()
+            elif self.blitter.update(*axes) and self.recorder is not None:
+                # blitting is done once update returns, there is no draw_event
+                self.recorder.painted()
 
     def _yearly_on_pick(self, event):
         """Process picks on 'year' scale axes"""
@@ -120,36 +568,49 @@ class AggregatedTimeTrace:
         if self.yearly_art is None or event.artist is not self.yearly_art[0][0]:
             return
         # loop over the points we hit and plot the 'month' scale data
-        for i in event.ind:
-            row = self.data_by_month.iloc[i]
-            self._plot_T_by_day(int(row["year"]), int(row["month"]))
+        with self._event("pick_month"):
+            for i in event.ind:
+                row = self.data_by_month.iloc[i]
+                self._plot_T_by_day(int(row["year"]), int(row["month"]))
 
     def _monthly_on_pick(self, event):
         """Process picks on 'month' scale axes"""
         # if we are not in the right axes, bail
         if event.mouseevent.inaxes is not self.monthly_ax:
             return
-        # get the label from the picked aritst
-        label = event.artist.get_gid()
         # if the shift key is held down, remove this data
         if event.mouseevent.key == "shift":
+            with self._event("remove_month"):
+                self._remove_month(event.artist.get_gid())
+            return
+        # else, loop through the points we hit and plot the daily
+        with self._event("pick_day"):
+            self._plot_days(event.artist.get_gid(), event.ind)
+
+    def _remove_month(self, label):
+        with self._phase("remove"):
             self.daily_index.pop(label, None)
             arts = self.daily_artists.pop(label, [])
+            if arts:
+                self.dispatcher.disconnect(arts[0][0])
             for art in arts:
-                # work around a bug!
+                if self.blitter is not None:
+                    self.blitter.discard(art)
+                art.remove()
+                # work around a bug in older Matplotlib
                 if art in self.monthly_ax.containers:
                     self.monthly_ax.containers.remove(art)
-                art.remove()
-            # regenerate the legend
-            self.monthly_ax.legend()
-            # ask the GUI to redraw when convenient
-            self.monthly_ax.figure.canvas.draw_idle()
-            return
-        # else, loop through the points we hit and plot the daily
-        for i in event.ind:
+        # regenerate the legend
+        self._update_legend(self.monthly_ax)
+        # ask the GUI to redraw when convenient
+        self._redraw(self.monthly_ax, self.yearly_ax)
+
+    def _plot_days(self, label, ind):
+        for i in ind:
             try:
-                sel_date = self.daily_index[label][i]
-            except KeyError:
+                # event.ind is positional, the index is days from the 1st
+                sel_date = self.daily_index[label].iloc[i]
+            except (KeyError, IndexError):
                 ...
             else:
                 self._plot_T_by_hour(sel_date.year, sel_date.month, sel_date.day)
@@ -157,145 +618,752 @@ class AggregatedTimeTrace:
     def _daily_on_pick(self, event):
         if event.mouseevent.inaxes is not self.daily_ax:
             return
-        # grab the canvas
-        canvas = event.artist.figure.canvas
-        # remove the artist
-        label = event.artist.get_label()
-        for a in self.hourly_artiists.pop(label, []):
-            a.remove()
+        with self._event("remove_day"):
+            # remove the artist
+            with self._phase("remove"):
+                label = event.artist.get_label()
+                self.dispatcher.disconnect(event.artist)
+                for a in self.hourly_artiists.pop(label, []):
+                    if self.blitter is not None:
+                        self.blitter.discard(a)
+                    a.remove()
 
-        # update the legend
-        self.daily_ax.legend()
-        # redraw the canvas next time it is convenient
-        canvas.draw_idle()
+            # update the legend
+            self._update_legend(self.daily_ax)
+            # redraw the canvas next time it is convenient
+            self._redraw(self.daily_ax, self.monthly_ax)
 
     def _plot_T_by_day(self, year, month):
-        # get the data we need
-        df = extract_month_of_daily(self.data_by_day, year, month)
         # format the label
         label = "{:s}: {:04d}-{:02d}".format(self.label, year, month)
         # if we have already plotted this, don't bother
         if label in self.daily_artists:
             return
-        # plot the data
-        eb, fill = plot_aggregated_errorbar(
-            self.monthly_ax,
-            df,
-            label,
-            picker=True,
-            pickradius=5,
-            **next(self.style_cycle),
-        )
-        # set the gid of the line (which is what will be picked) to label
-        eb[0].set_gid(label)
-        # add a marker to year ax to show where we are plotting
-        mark = self.yearly_ax.axvline(
-            datetime.datetime(year, month, 15),
-            color=eb[0].get_color(),
-            zorder=15,
-        )
+        # get the data we need
+        with self._phase("extract"):
+            df = self.month_cache.get(
+                (year, month),
+                lambda: extract_month_of_daily(self.data_by_day, year, month),
+            )
+        with self._phase("plot"):
+            # plot the data
+            eb, fill = plot_aggregated_errorbar(
+                self.monthly_ax,
+                df,
+                label,
+                picker=True,
+                pickradius=5,
+                redraw=False,
+                **next(self.style_cycle),
+            )
+            # set the gid of the line (which is what will be picked) to label
+            eb[0].set_gid(label)
+            self.dispatcher.connect(eb[0], self._monthly_on_pick)
+            # add a marker to year ax to show where we are plotting
+            mark = self.yearly_ax.axvline(
+                datetime.datetime(year, month, 15),
+                color=eb[0].get_color(),
+                zorder=15,
+            )
         # stash the artists so we can remove them later
         self.daily_artists[label] = [eb, fill, mark]
         # stash the dates associated with the points so we can use in
         # plotting later
         self.daily_index[label] = df["index"]
+        if self.blitter is not None:
+            for art in self.daily_artists[label]:
+                self.blitter.add(art)
+        self._update_legend(self.monthly_ax)
+        self._redraw(self.monthly_ax, self.yearly_ax)
 
     def _plot_T_by_hour(self, year, month, day):
-        # get the hourly data for a single day
-        df = extract_day_of_hourly(self.data_by_hour, year, month, day)
         # format the label
         label = "{:s}: {:04d}-{:02d}-{:02d}".format(self.label, year, month, day)
-        if label is self.hourly_artiists:
+        if label in self.hourly_artiists:
             return
+        # get the hourly data for a single day
+        with self._phase("extract"):
+            df = self.day_cache.get(
+                (year, month, day),
+                lambda: extract_day_of_hourly(self.data_by_hour, year, month, day),
+            )
 
-        # A 'simple' plot
-        (ln,) = self.daily_ax.plot(
-            "T",
-            linestyle="-",
-            picker=True,
-            pickradius=10,
-            label=label,
-            data=df,
-            **next(self.style_cycle),
-        )
-        # put marker on the monthly plot
-        (mark,) = self.monthly_ax.plot(
-            day - 1, df["T"].mean(), marker="o", zorder=15, color=ln.get_color()
-        )
+        with self._phase("plot"):
+            # A 'simple' plot
+            (ln,) = self.daily_ax.plot(
+                "T",
+                linestyle="-",
+                picker=True,
+                pickradius=10,
+                label=label,
+                data=df,
+                **next(self.style_cycle),
+            )
+            self.dispatcher.connect(ln, self._daily_on_pick)
+            # put marker on the monthly plot
+            (mark,) = self.monthly_ax.plot(
+                day - 1, df["T"].mean(), marker="o", zorder=15, color=ln.get_color()
+            )
+        self.hourly_artiists[label] = [ln, mark]
+        if self.blitter is not None:
+            self.blitter.add(ln)
+            self.blitter.add(mark)
         # update the legend
-        self.daily_ax.legend()
+        self._update_legend(self.daily_ax)
         # ask the GUI to redraw the next time it can
-        self.daily_ax.figure.canvas.draw_idle()
-        self.hourly_artiists[label] = [ln, mark]
+        self._redraw(self.daily_ax, self.monthly_ax)
+
+    def append(self, new_hourly):
+        """Add new hourly observations
+
+        Only the day and month aggregates that the new data falls in are
+        re-computed (see `update_aggregate`) and only the artists showing
+        those months and days are updated.
+
+        Parameters
+        ----------
+        new_hourly : DataFrame
+            Same columns and index as the hourly data passed in
+        """
+        hourly = pd.concat([self.data_by_hour, new_hourly])
+        if not hourly.index.is_monotonic_increasing:
+            hourly = hourly.sort_index()
+        # skip the setters, only the touched entries are stale
+        self._data_by_hour = hourly
+        self._data_by_day, days = update_aggregate(
+            self.data_by_day, new_hourly, ["year", "month", "day"]
+        )
+        self.data_by_month, months = update_aggregate(
+            self.data_by_month, new_hourly, ["year", "month"]
+        )
+
+        # the year scale plot
+        eb, fill = self.yearly_art
+        self.yearly_art = (
+            eb,
+            update_aggregated_errorbar(self.yearly_ax, eb, fill, self.data_by_month),
+        )
+        self.yearly_ax.relim()
+        self.yearly_ax.autoscale_view()
+
+        # any open months
+        for year, month in zip(months["year"], months["month"]):
+            self.month_cache.discard((year, month))
+            label = "{:s}: {:04d}-{:02d}".format(self.label, year, month)
+            if label not in self.daily_artists:
+                continue
+            eb, fill, mark = self.daily_artists[label]
+            df = self.month_cache.get(
+                (year, month),
+                lambda: extract_month_of_daily(self.data_by_day, year, month),
+            )
+            if self.blitter is not None:
+                # before the fill is removed from (and forgets) its axes
+                self.blitter.discard(fill)
+            new_fill = update_aggregated_errorbar(self.monthly_ax, eb, fill, df)
+            if self.blitter is not None:
+                self.blitter.add(new_fill)
+            self.daily_artists[label] = [eb, new_fill, mark]
+            self.daily_index[label] = df["index"]
+
+        # any open days
+        for year, month, day in zip(days["year"], days["month"], days["day"]):
+            self.day_cache.discard((year, month, day))
+            label = "{:s}: {:04d}-{:02d}-{:02d}".format(self.label, year, month, day)
+            if label not in self.hourly_artiists:
+                continue
+            ln, mark = self.hourly_artiists[label]
+            df = self.day_cache.get(
+                (year, month, day),
+                lambda: extract_day_of_hourly(self.data_by_hour, year, month, day),
+            )
+            ln.set_data(df.index, df["T"])
+            mark.set_data([day - 1], [df["T"].mean()])
+
+        self.yearly_ax.figure.canvas.draw_idle()
 
     def remove(self):
+        self.dispatcher.disconnect(self.yearly_art[0][0])
         for art in self.yearly_art:
             art.remove()
+        for eb, *_ in self.daily_artists.values():
+            self.dispatcher.disconnect(eb[0])
+        for ln, *_ in self.hourly_artiists.values():
+            self.dispatcher.disconnect(ln)
         for _, arts in itertools.chain(
             self.daily_artists.items(), self.hourly_artiists.items()
         ):
             for a in arts:
+                if self.blitter is not None:
+                    self.blitter.discard(a)
                 a.remove()
         self.yearly_art = None
-        self.yearly_ax.figure.canvas.mpl_disconnect(self.cid)
+        self.daily_artists.clear()
+        self.daily_index.clear()
+        self.hourly_artiists.clear()
 
 
-def aggregate_by_month(df, col="T"):
-    """Given a data frame of hourly data, compute statistics by month
+class DecimatedLine:
+    def __init__(self, ax, x, y, **kwargs):
+        """A line that only draws what can be seen at the current zoom
+
+        For long series (decades of hourly data) drawing every point is
+        slow and, once there are many points per pixel, pointless.  A
+        pyramid of min/max values over blocks of 2, 4, 8, ... points is
+        computed once and, whenever the x-limits (or the size of the axes)
+        change, the coarsest level with at least one block per pixel
+        column is drawn as a min/max envelope.  The number of points drawn
+        depends on the width of the axes, not the length of the data.
+
+        Parameters
+        ----------
+        ax : Axes
+            The axes to draw to
+
+        x : array-like
+            Sorted x values, may be datetimes
+
+        y : array-like
+            The y values
+
+        **kwargs
+            Passed to `Axes.plot`
+        """
+        x = np.asarray(x)
+        if np.issubdtype(x.dtype, np.datetime64):
+            x = mdates.date2num(x)
+            ax.xaxis_date()
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        # levels[k] is the (min, max) of blocks of 2**(k + 1) points
+        self.levels = []
+        lo = hi = self.y
+        while len(lo) > 1:
+            if len(lo) % 2:
+                lo, hi = np.append(lo, lo[-1]), np.append(hi, hi[-1])
+            lo = np.fmin(lo[0::2], lo[1::2])
+            hi = np.fmax(hi[0::2], hi[1::2])
+            self.levels.append((lo, hi))
+
+        self.ax = ax
+        (self.line,) = ax.plot([], [], **kwargs)
+        if len(self.x):
+            ax.update_datalim(
+                [(self.x[0], np.nanmin(self.y)), (self.x[-1], np.nanmax(self.y))]
+            )
+            ax.autoscale_view()
+        # callbacks only hold weak references to bound methods, keep this
+        # object alive as long as its line is
+        self.line._decimator = self
+        self._update()
+        self.xlim_cid = ax.callbacks.connect("xlim_changed", self._update)
+        self.resize_cid = ax.figure.canvas.mpl_connect("resize_event", self._update)
+
+    def _update(self, *args):
+        xmin, xmax = self.ax.get_xlim()
+        width = max(int(self.ax.bbox.width), 1)
+        # one point either side so the line runs off the edge of the axes
+        i0 = max(np.searchsorted(self.x, xmin) - 1, 0)
+        i1 = min(np.searchsorted(self.x, xmax) + 1, len(self.x))
+        n = i1 - i0
+        if n <= 2 * width:
+            self.line.set_data(self.x[i0:i1], self.y[i0:i1])
+            return
+        # the coarsest level with at least one block per pixel column
+        k = int(np.log2(n / width))
+        block = 2 ** k
+        lo, hi = self.levels[k - 1]
+        j0, j1 = i0 // block, -(-i1 // block)
+        xs = self.x[j0 * block : j1 * block : block]
+        self.line.set_data(
+            np.repeat(xs, 2), np.column_stack([lo[j0:j1], hi[j0:j1]]).ravel()
+        )
+
+    def remove(self):
+        self.ax.callbacks.disconnect(self.xlim_cid)
+        self.ax.figure.canvas.mpl_disconnect(self.resize_cid)
+        self.line.remove()
+        del self.line._decimator
+
+
+def partial_stats(df, by, col="T"):
+    """Compute mergeable statistics of one column of a data frame
+
+    The result of several calls can be combined with
+    `merge_partial_stats` to get the statistics of the concatenated
+    inputs without holding them all in memory.
 
     Parameters
     ----------
     df : DataFrame
-       Must have columns {'year', 'month'}
+       Must have the columns in *by* and *col*
+
+    by : list of str
+       The columns to group on
 
     col : str, optional
        The column to aggregate.  Defaults to 'T'
 
+    Returns
+    -------
+    DataFrame
+       Indexed on *by*, has columns {'count', 'mean', 'M2', 'min', 'max'}
+       where 'M2' is the sum of squared deviations from the mean.
+    """
+    gb = df.groupby(list(by))[col]
+    out = gb.agg(["count", "mean", "min", "max"])
+    out["M2"] = gb.var(ddof=0) * out["count"]
+    return out[["count", "mean", "M2", "min", "max"]]
+
+
+def merge_partial_stats(*partials):
+    """Combine the output of several calls to `partial_stats`
+
+    Uses the pairwise update of Chan et al. so the variance is stable.
+
+    Parameters
+    ----------
+    *partials : DataFrame
+       Outputs of `partial_stats` grouped on the same columns
+
+    Returns
+    -------
+    DataFrame
+       Same columns as the inputs, indexed on the union of the groups
+    """
+    both = pd.concat(partials)
+    levels = list(range(both.index.nlevels))
+    gb = both.groupby(level=levels)
+    count = gb["count"].sum()
+    mean = (both["mean"] * both["count"]).groupby(level=levels).sum() / count
+    # the spread of the partial means about the merged mean
+    spread = both["count"] * (both["mean"] - mean.reindex(both.index).values) ** 2
+    return pd.DataFrame(
+        {
+            "count": count,
+            "mean": mean,
+            "M2": gb["M2"].sum() + spread.groupby(level=levels).sum(),
+            "min": gb["min"].min(),
+            "max": gb["max"].max(),
+        }
+    )
+
+
+def _aggregate_chunks(chunks, by, col):
+    """Aggregate an iterable of data frames one at a time"""
+    # only the (small) per-chunk statistics are kept, not the chunks
+    parts = [partial_stats(chunk, by, col) for chunk in chunks]
+    if not parts:
+        raise ValueError("No data to aggregate")
+    running = merge_partial_stats(*parts)
+    std = np.sqrt(running["M2"] / (running["count"] - 1))
+    return running.drop(columns="M2").assign(std=std)[AGGREGATE_STATS]
+
+
+def _date_index(year, month, day):
+    """Build a DatetimeIndex from arrays of year, month, and day"""
+    year, month, day = (np.asarray(v, dtype=np.int64) for v in (year, month, day))
+    months = (year - 1970) * 12 + (month - 1)
+    dates = months.astype("datetime64[M]").astype("datetime64[D]") + (day - 1)
+    return pd.DatetimeIndex(dates.astype("datetime64[ns]"))
+
+
+def _by_date_index(gb, by):
+    """Index on the day, or the 15th of the month if not grouped by day"""
+    return _date_index(gb["year"], gb["month"], gb["day"] if "day" in by else 15)
+
+
+def _aggregate(df, by, col, quantiles):
+    """Compute `AGGREGATE_STATS` (and *quantiles*) of *col* grouped by *by*"""
+    if isinstance(df, pd.DataFrame):
+        gb = df.groupby(by)[col]
+        out = gb.agg(AGGREGATE_STATS)
+        if len(quantiles):
+            qs = gb.quantile(list(quantiles)).unstack()
+            qs.columns = [f"{q * 100:g}%" for q in qs.columns]
+            # same column order as `describe`
+            out = pd.concat([out.drop(columns="max"), qs, out["max"]], axis=1)
+    else:
+        if len(quantiles):
+            raise ValueError("quantiles can not be computed from chunks")
+        out = _aggregate_chunks(df, by, col)
+    return out.reset_index()
+
+
+def aggregate_by_month(df, col="T", quantiles=()):
+    """Given a data frame of hourly data, compute statistics by month
+
+    Parameters
+    ----------
+    df : DataFrame or iterable of DataFrame or HourlyCube
+       Must have columns {'year', 'month'}.  If an iterable of chunks (for
+       example from `isd_utils.iter_hourly_data`) is passed they are
+       aggregated one at a time.  A `HourlyCube` is reduced directly,
+       several reports in one hour count once.
+
+    col : str, optional
+       The column to aggregate.  Defaults to 'T', ignored for a cube
+
+    quantiles : list of float, optional
+       Quantiles to compute in addition to `AGGREGATE_STATS`, passing
+       ``(0.25, 0.5, 0.75)`` gives the same columns as `describe`.  Not
+       supported for chunked input.
+
     Returns
     -------
     DataFrame
        Indexed on the 15th of the month,
-       Has columns of `describe` + 'year' and 'month'
+       Has columns of `AGGREGATE_STATS` (+ quantiles) + 'year' and 'month'
     """
-    gb = df.groupby(["year", "month"])[col].describe()
-    new_index = [datetime.date(*m, *(15,)) for m in gb.index]
-    gb.reset_index(inplace=True)
-    gb.index = new_index
+    if isinstance(df, HourlyCube):
+        if len(quantiles):
+            raise ValueError("quantiles can not be computed from a HourlyCube")
+        return df.aggregate_by_month()
+    gb = _aggregate(df, ["year", "month"], col, quantiles)
+    gb.index = _by_date_index(gb, ["year", "month"])
     return gb
 
 
-def aggregate_by_day(df, col="T"):
+def aggregate_by_day(df, col="T", quantiles=()):
     """Given a data frame of hourly data, compute statistics by day
 
     Parameters
     ----------
-    df : DataFrame
-       Must have columns {'year', 'month', 'day'}
+    df : DataFrame or iterable of DataFrame or HourlyCube
+       Must have columns {'year', 'month', 'day'}.  If an iterable of
+       chunks is passed they are aggregated one at a time, a
+       `HourlyCube` is reduced directly.
 
     col : str, optional
-       The column to aggregate.  Defaults to 'T'
+       The column to aggregate.  Defaults to 'T', ignored for a cube
+
+    quantiles : list of float, optional
+       Quantiles to compute in addition to `AGGREGATE_STATS`, see
+       `aggregate_by_month`.
 
     Returns
     -------
     DataFrame
        Indexed by day.
-       Has columns of `describe` + 'year', 'month', and 'day'
+       Has columns of `AGGREGATE_STATS` (+ quantiles) + 'year', 'month',
+       and 'day'
     """
-
-    gb = df.groupby(["year", "month", "day"])[col].describe()
-    new_index = [datetime.date(*m) for m in gb.index]
-    gb.reset_index(inplace=True)
-    gb.index = new_index
+    if isinstance(df, HourlyCube):
+        if len(quantiles):
+            raise ValueError("quantiles can not be computed from a HourlyCube")
+        return df.aggregate_by_day()
+    gb = _aggregate(df, ["year", "month", "day"], col, quantiles)
+    gb.index = _by_date_index(gb, ["year", "month", "day"])
     return gb
 
 
+def update_aggregate(agg, df, by, col="T"):
+    """Fold new hourly data into existing aggregated data
+
+    The rows of *agg* the new data falls in are turned back into mergeable
+    statistics (see `partial_stats`), merged with those of *df*, and
+    replaced.  The cost scales with the size of *df*, not *agg*.
+
+    Parameters
+    ----------
+    agg : DataFrame
+        The output of `aggregate_by_day` or `aggregate_by_month`
+
+    df : DataFrame
+        New hourly data, must have the columns in *by* and *col*
+
+    by : list of str
+        The columns *agg* was grouped on, ``["year", "month", "day"]`` or
+        ``["year", "month"]``
+
+    col : str, optional
+       The column to aggregate.  Defaults to 'T'
+
+    Returns
+    -------
+    updated : DataFrame
+        *agg* with the new data included.  Any quantile columns of the
+        changed rows are NaN.
+
+    changed : DataFrame
+        The rows of *updated* that were added or changed
+    """
+    new = partial_stats(df, by, col).reset_index()
+    new.index = _by_date_index(new, by)
+    old = agg.loc[agg.index.intersection(new.index)]
+    old_stats = pd.DataFrame(
+        {
+            "count": old["count"],
+            "mean": old["mean"],
+            # single samples have a std of NaN
+            "M2": old["std"].fillna(0) ** 2 * (old["count"] - 1),
+            "min": old["min"],
+            "max": old["max"],
+        }
+    )
+    merged = merge_partial_stats(old_stats, new[old_stats.columns])
+    merged["std"] = np.sqrt(merged["M2"] / (merged["count"] - 1))
+    for k in by:
+        merged[k] = getattr(merged.index, k)
+    changed = merged.reindex(columns=agg.columns)
+    updated = pd.concat([agg.drop(index=old.index), changed]).sort_index()
+    return updated, changed
+
+
+def _nan_stats(x, axis=-1):
+    """`AGGREGATE_STATS` of *x* along *axis*, ignoring NaN
+
+    Unlike the ``np.nan*`` functions this does not warn about slices that
+    are all NaN, they get a count of 0 and NaN for the other statistics.
+    """
+    count = np.sum(~np.isnan(x), axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.nansum(x, axis=axis) / count
+        M2 = np.nansum((x - np.expand_dims(mean, axis)) ** 2, axis=axis)
+        std = np.where(count > 1, np.sqrt(M2 / (count - 1)), np.nan)
+    return {
+        "count": count,
+        "mean": mean,
+        "std": std,
+        "min": np.fmin.reduce(x, axis=axis),
+        "max": np.fmax.reduce(x, axis=axis),
+    }
+
+
+class HourlyCube:
+    def __init__(self, data, first_year, col="T"):
+        """Hourly values on a dense (year, day of year, hour) grid
+
+        Every year has 366 day slots, Feb 29 is left empty (NaN) in
+        non-leap years, so ``data[:, slot, hour]`` is the same calendar
+        day and hour in every year.  Missing hours are NaN.  Looking up a
+        day or a month is indexing and the aggregates are reductions over
+        the trailing axes, there is no search of the irregular hourly
+        frame.  Use `build_hourly_cube` to make one.
+
+        Parameters
+        ----------
+        data : ndarray
+            Shape (n_years, 366, 24)
+
+        first_year : int
+            The year of ``data[0]``
+
+        col : str, optional
+            The name of the values, used for the extracted data frames
+        """
+        self.data = data
+        self.first_year = int(first_year)
+        self.col = col
+
+    def __repr__(self):
+        return (
+            f"<HourlyCube {self.col!r} {self.first_year}-"
+            f"{self.first_year + len(self.data) - 1}>"
+        )
+
+    @property
+    def years(self):
+        return np.arange(self.first_year, self.first_year + len(self.data))
+
+    @staticmethod
+    def slot(month, day):
+        """The day-of-year slot of *month* / *day*"""
+        return _MONTH_START[np.asarray(month) - 1] + np.asarray(day) - 1
+
+    def _year_index(self, year):
+        i = year - self.first_year
+        return i if 0 <= i < len(self.data) else None
+
+    def _stats_frame(self, stats, year_index, month, day=None):
+        """Arrange the output of `_nan_stats` like `aggregate_by_day`"""
+        columns = {"year": self.years[year_index], "month": month}
+        if day is not None:
+            columns["day"] = day
+        columns.update((k, stats[k]) for k in AGGREGATE_STATS)
+        df = pd.DataFrame(columns)
+        df.index = _date_index(df["year"], month, 15 if day is None else day)
+        return df
+
+    def extract_day(self, year, month, day):
+        """The hourly values of one day, see `extract_day_of_hourly`"""
+        i = self._year_index(year)
+        values = (
+            self.data[i, self.slot(month, day)]
+            if i is not None
+            else np.full(24, np.nan)
+        )
+        hours = np.flatnonzero(~np.isnan(values))
+        return pd.DataFrame(
+            {
+                "year": year,
+                "month": month,
+                "day": day,
+                "hour": hours,
+                self.col: values[hours],
+            },
+            index=hours.astype(float),
+        )
+
+    def extract_month_of_daily(self, year, month):
+        """The daily statistics of one month, see `extract_month_of_daily`"""
+        i = self._year_index(year)
+        start, stop = _MONTH_START[month - 1], _MONTH_STOP[month - 1]
+        if i is None:
+            stats = _nan_stats(np.full((0, 24), np.nan))
+            slots = np.arange(0)
+        else:
+            stats = _nan_stats(self.data[i, start:stop])
+            slots = np.flatnonzero(stats["count"])
+            stats = {k: v[slots] for k, v in stats.items()}
+            slots += start
+        df = self._stats_frame(
+            stats, np.full(len(slots), i or 0), month, _SLOT_DAY[slots]
+        )
+        df.index.name = None
+        df = df.reset_index()
+        df.index = _SLOT_DAY[slots] - 1
+        return df
+
+    def aggregate_by_day(self):
+        """Statistics of each day, see `aggregate_by_day`"""
+        stats = _nan_stats(self.data)
+        year_index, slots = np.nonzero(stats["count"])
+        return self._stats_frame(
+            {k: v[year_index, slots] for k, v in stats.items()},
+            year_index,
+            _SLOT_MONTH[slots],
+            _SLOT_DAY[slots],
+        )
+
+    def aggregate_by_month(self):
+        """Statistics of each month, see `aggregate_by_month`"""
+        n_years = len(self.data)
+        per_month = [
+            _nan_stats(self.data[:, start:stop].reshape(n_years, -1))
+            for start, stop in zip(_MONTH_START, _MONTH_STOP)
+        ]
+        stats = {k: np.stack([m[k] for m in per_month], axis=1) for k in per_month[0]}
+        year_index, month_index = np.nonzero(stats["count"])
+        return self._stats_frame(
+            {k: v[year_index, month_index] for k, v in stats.items()},
+            year_index,
+            month_index + 1,
+        )
+
+    def climatology(self, years=None):
+        """The mean of each (day of year, hour) over many years
+
+        Parameters
+        ----------
+        years : list of int, optional
+            The years to average over, defaults to all of them.  Must be
+            in the cube.
+
+        Returns
+        -------
+        ndarray
+            Shape (366, 24), NaN where there is no data in any of *years*
+        """
+        data = self.data
+        if years is not None:
+            index = np.asarray(years) - self.first_year
+            outside = (index < 0) | (index >= len(data))
+            if outside.any():
+                raise ValueError(
+                    f"years {np.asarray(years)[outside].tolist()} are not in "
+                    f"{self.first_year}-{self.first_year + len(data) - 1}"
+                )
+            data = data[index]
+        return _nan_stats(data, axis=0)["mean"]
+
+    def anomaly(self, years=None):
+        """The difference of every value from the `climatology`
+
+        Parameters
+        ----------
+        years : list of int, optional
+            The years the climatology is computed over, defaults to all
+
+        Returns
+        -------
+        ndarray
+            Same shape as `data`
+        """
+        return self.data - self.climatology(years)
+
+
+def build_hourly_cube(hourly_df, col="T", dedup="mean"):
+    """Put hourly data on a dense (year, day of year, hour) grid
+
+    Parameters
+    ----------
+    hourly_df : DataFrame
+        Must have columns {'year', 'month', 'day', 'hour'} and *col*, as
+        returned by `load_data`
+
+    col : str, optional
+        The column to put in the cube.  Defaults to 'T'
+
+    dedup : {'mean', 'first', 'last'}, optional
+        What to do with several reports in the same hour, by default
+        they are averaged.  'first' and 'last' are in the order of
+        *hourly_df*.
+
+    Returns
+    -------
+    HourlyCube
+    """
+    year, month, day, hour = (
+        hourly_df[k].to_numpy(dtype=np.int64) for k in ("year", "month", "day", "hour")
+    )
+    values = hourly_df[col].to_numpy(dtype=float)
+    good = ~np.isnan(values)
+    if not good.any():
+        raise ValueError("No data to put in the cube")
+    first_year = year[good].min()
+    n_years = year[good].max() - first_year + 1
+    size = n_years * 366 * 24
+    flat = ((year - first_year) * 366 + HourlyCube.slot(month, day)) * 24 + hour
+    flat, values = flat[good], values[good]
+
+    if dedup == "mean":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            data = np.bincount(flat, values, minlength=size) / np.bincount(
+                flat, minlength=size
+            )
+    elif dedup in ("first", "last"):
+        if dedup == "last":
+            flat, values = flat[::-1], values[::-1]
+        _, first = np.unique(flat, return_index=True)
+        data = np.full(size, np.nan)
+        data[flat[first]] = values[first]
+    else:
+        raise ValueError(f"dedup must be 'mean', 'first', or 'last', not {dedup!r}")
+    return HourlyCube(data.reshape(n_years, 366, 24), first_year, col)
+
+
+def _time_slice(df, start, stop):
+    """Select the rows of *df* with ``start <= index < stop``
+
+    If the index is sorted this is a binary search, so the cost does not
+    depend on the length of *df*.
+    """
+    if df.index.is_monotonic_increasing:
+        i0, i1 = df.index.searchsorted([start, stop])
+        return df.iloc[i0:i1]
+    return df[(df.index >= start) & (df.index < stop)]
+
+
 def extract_month_of_daily(daily, year, month):
     """Given daily values, extract a given month
 
     Parameters
     ----------
-    daily : DataFrame
-        must of columns {'year', 'month'}
+    daily : DataFrame or HourlyCube
+        Must have a time index, as returned by `aggregate_by_day`.  For a
+        `HourlyCube` the daily statistics of the month are computed
+        from the cube.
 
     year, month : int
         The year and month of interest
@@ -304,13 +1372,14 @@ def extract_month_of_daily(daily, year, month):
     -------
 
     DataFrame
-         Indexed on days from start of month.  Same columns as input
+         Indexed on days from start of month.  Same columns as input plus
+         'index' with the dates.
     """
-    ix = (daily["month"] == month) & (daily["year"] == year)
-    df = daily[ix]
-    idx = [(m - df.index[0]).days for m in df.index]
-    df.reset_index(inplace=True)
-    df.index = idx
+    if isinstance(daily, HourlyCube):
+        return daily.extract_month_of_daily(year, month)
+    start = pd.Timestamp(year, month, 1)
+    df = _time_slice(daily, start, start + pd.DateOffset(months=1)).reset_index()
+    df.index = (df["index"] - start).dt.days.to_numpy()
     return df
 
 
@@ -319,23 +1388,23 @@ def extract_day_of_hourly(hourly_df, year, month, day):
 
     Parameters
     ----------
-    hourly_df : DataFrame
-      Must have columns 'year', 'month', 'day' with the expected semantics and
-      a time index
+    hourly_df : DataFrame or HourlyCube
+      Must have a time index, as returned by `load_data`.  A cube has at
+      most one value per hour, at whole hours.
 
     year, month, day : int
         The day to extract the data for
-    """
 
-    ix = (
-        (hourly_df["month"] == month)
-        & (hourly_df["year"] == year)
-        & (hourly_df["day"] == day)
-    )
-    df = hourly_df[ix]
-    midnight = datetime.datetime(year, month, day, 0, 0)
-    df.index = [(m - midnight).seconds / 3600 for m in df.index]
-    return df
+    Returns
+    -------
+    DataFrame
+        Indexed on hours from midnight.  Same columns as input.
+    """
+    if isinstance(hourly_df, HourlyCube):
+        return hourly_df.extract_day(year, month, day)
+    midnight = pd.Timestamp(year, month, day)
+    df = _time_slice(hourly_df, midnight, midnight + pd.Timedelta(days=1))
+    return df.set_axis((df.index - midnight).total_seconds().to_numpy() / 3600)
 
 
 def label_date(ax, label, date, df):
@@ -351,14 +1420,14 @@ def label_date(ax, label, date, df):
     label : str
         The text of the label
 
-    date : object in index of df
+    date : datetime-like in index of df
         The x coordinate
 
     df : DataFrame
         The data source
 
     """
-    y = df.loc[date]["mean"]
+    y = df.loc[pd.Timestamp(date)]["mean"]
     return ax.annotate(
         label,
         (date, y),
@@ -369,7 +1438,63 @@ def label_date(ax, label, date, df):
     )
 
 
-def load_data(dataset):
+def _source_key(source):
+    """Key identifying the hourly data file and the aggregation code"""
+    st = os.stat(source)
+    return f"{AGGREGATE_VERSION}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def load_aggregates(hourly_data, source, fname, rebuild=False):
+    """Load the day and month aggregates of hourly data from a file
+
+    If *fname* does not exist, can not be read, was computed from a
+    different version of *source* or by an older `AGGREGATE_VERSION`, the
+    aggregates are computed and (over)written to *fname*.
+
+    Parameters
+    ----------
+    hourly_data : DataFrame
+       Must have columns {'year', 'month', 'day'}
+
+    source : str or Path
+       The file *hourly_data* was read from, its size and mtime identify
+       the data the aggregates were computed from
+
+    fname : str or Path
+       The HDF5 file to store the aggregates in
+
+    rebuild : bool, optional
+       Re-compute the aggregates even if the stored ones are current
+
+    Returns
+    -------
+    agg_by_day, agg_by_month : DataFrame
+       The output of `aggregate_by_day` and `aggregate_by_month`
+    """
+    key = _source_key(source)
+    if not rebuild:
+        try:
+            with pd.HDFStore(str(fname), "r") as store:
+                if store.get_storer("by_day").attrs.source_key == key:
+                    return store["by_day"], store["by_month"]
+        except Exception:
+            # missing, incomplete or corrupt, fall through and rebuild
+            pass
+
+    agg_by_day = aggregate_by_day(hourly_data)
+    agg_by_month = aggregate_by_month(hourly_data)
+    # write to a temporary file and rename so an interrupted write never
+    # leaves a broken file behind
+    tmp_file = f"{fname}.{os.getpid()}.tmp"
+    with pd.HDFStore(tmp_file, "w") as store:
+        store.put("by_day", agg_by_day)
+        store.put("by_month", agg_by_month)
+        store.get_storer("by_day").attrs.source_key = key
+    os.replace(tmp_file, fname)
+    return agg_by_day, agg_by_month
+
+
+def load_data(dataset, aggregates=False, compact=False):
     """Load data from a given dataset
 
     Parameters
@@ -377,21 +1502,48 @@ def load_data(dataset):
     dataset : str
        Searches from dataset.h5 in this file's directory
 
+    aggregates : bool, optional
+       If True, also return the data aggregated by day and month.  These
+       are stored in dataset.agg.h5 next to the hourly data and are only
+       re-computed when the hourly data changes, see `load_aggregates`.
+
+    compact : bool, optional
+       If True, the hourly data is returned with small integer calendar
+       columns and float32 temperature, see `isd_utils.compact_hourly`.
+       The aggregates are always computed at full precision.
+
     Returns
     -------
     DataFrame
        Hourly temperature data
+
+    agg_by_day, agg_by_month : DataFrame
+       Only if *aggregates* is True.  Suitable to pass to
+       `AggregatedTimeTrace`
     """
     p = Path(".") / "data"
     fname = p / f"{dataset}.h5"
 
     try:
-        return pd.read_hdf(str(fname))
+        hourly = pd.read_hdf(str(fname))
     except FileNotFoundError:
-        sources = {f.stem for f in p.iterdir() if f.is_file() and f.name.endswith("h5")}
+        sources = {
+            f.stem
+            for f in p.iterdir()
+            if f.is_file()
+            and f.name.endswith("h5")
+            and not f.name.endswith(AGGREGATE_SUFFIX)
+        }
         raise RuntimeError(
             f"Could not not find {dataset!r}.  Existing " f"datasets are {sources}"
         )
+    if aggregates:
+        aggs = load_aggregates(hourly, fname, p / f"{dataset}{AGGREGATE_SUFFIX}")
+    if compact:
+        hourly = compact_hourly(hourly)
+    if not aggregates:
+        return hourly
+    return (hourly, *aggs)
 
 
 def setup_temperature_figure(**kwargs):
@@ -419,7 +1571,7 @@ def setup_temperature_figure(**kwargs):
     return fig, ax_lst
 
 
-def plot_aggregated_errorbar(ax, gb, label, pickradius=None, **kwargs):
+def plot_aggregated_errorbar(ax, gb, label, pickradius=None, *, redraw=True, **kwargs):
     kwargs.setdefault("capsize", 3)
     kwargs.setdefault("markersize", 5)
     eb = ax.errorbar(
@@ -434,6 +1586,54 @@ def plot_aggregated_errorbar(ax, gb, label, pickradius=None, **kwargs):
     fill = ax.fill_between(
         gb.index, "min", "max", alpha=0.5, data=gb, color=eb[0].get_color()
     )
-    ax.legend()
-    ax.figure.canvas.draw_idle()
+    if redraw:
+        ax.legend()
+        ax.figure.canvas.draw_idle()
     return eb, fill
+
+
+def update_aggregated_errorbar(ax, eb, fill, gb):
+    """Update the artists from `plot_aggregated_errorbar` with new data
+
+    Parameters
+    ----------
+    ax : Axes
+        The axes the artists are in
+
+    eb : ErrorbarContainer
+        Updated in place
+
+    fill : PolyCollection
+        Is replaced
+
+    gb : DataFrame
+        The new data, same columns as passed to `plot_aggregated_errorbar`
+
+    Returns
+    -------
+    PolyCollection
+        The replacement for *fill*
+    """
+    data_line, caplines, (barlines,) = eb
+    y, err = gb["mean"].to_numpy(), gb["std"].to_numpy()
+    data_line.set_data(gb.index, y)
+    # in converted (float) units to build the line segments
+    x = data_line.get_xdata(orig=False)
+    if caplines:
+        lower, upper = caplines
+        lower.set_data(x, y - err)
+        upper.set_data(x, y + err)
+    barlines.set_segments(
+        np.stack([np.column_stack([x, y - err]), np.column_stack([x, y + err])], axis=1)
+    )
+    new_fill = ax.fill_between(
+        gb.index,
+        "min",
+        "max",
+        alpha=fill.get_alpha(),
+        data=gb,
+        color=data_line.get_color(),
+        zorder=fill.get_zorder(),
+    )
+    fill.remove()
+    return new_fill
@@ -1,10 +1,12 @@
 # https://drive.google.com/open?id=0B5vxvuZBEEfTRGdXZ2NXUjNKUUk
+from contextlib import nullcontext
 
 import h5py
 import matplotlib.gridspec as gridspec
 import matplotlib.widgets as mwidgets
 from matplotlib import path
 import numpy as np
+from scipy.spatial import cKDTree
 
 
 # uncomment this to set the backend
@@ -12,22 +14,416 @@ import numpy as np
 # matplotlib.use('Qt4Agg')
 import matplotlib.pyplot as plt
 
+# the most memory the reductions over the spectral cube use at once
+BLOCK_BYTES = 64 * 2 ** 20
+
+
+def _row_blocks(counts, rows=None, max_bytes=BLOCK_BYTES):
+    """Slices of rows of *counts* small enough to reduce in memory
+
+    For chunked (h5py) datasets the slices are aligned to the chunks so
+    no chunk is read twice.
+
+    Parameters
+    ----------
+    counts : array or Dataset
+        Shape (ny, nx, n_bins)
+
+    rows : slice, optional
+        Only cover these rows, defaults to all of them
+
+    max_bytes : int, optional
+        The largest block, as float64
+
+    Yields
+    ------
+    slice
+    """
+    ny, nx, n_bins = counts.shape
+    start, stop, _ = (rows or slice(None)).indices(ny)
+    step = max(1, max_bytes // (nx * n_bins * 8))
+    chunks = getattr(counts, "chunks", None)
+    if chunks:
+        step = max(chunks[0], step // chunks[0] * chunks[0])
+        # start at a chunk boundary
+        start -= start % chunks[0]
+    for block_start in range(start, stop, step):
+        yield slice(block_start, min(block_start + step, stop))
+
+
+def sum_image(counts, norm=None, roi=slice(None), max_bytes=BLOCK_BYTES):
+    """The sum of the (normalized) counts of each pixel over an energy ROI
+
+    Parameters
+    ----------
+    counts : array or Dataset
+        Shape (ny, nx, n_bins), read a block of rows at a time
+
+    norm : array, optional
+        Shape (ny, nx), the sums are divided by this
+
+    roi : slice, optional
+        The bins to sum, defaults to all of them
+
+    max_bytes : int, optional
+        See `_row_blocks`
+
+    Returns
+    -------
+    ndarray
+        Shape (ny, nx)
+    """
+    image = np.empty(counts.shape[:2])
+    for rows in _row_blocks(counts, max_bytes=max_bytes):
+        image[rows] = counts[rows, :, roi].sum(axis=2, dtype=float)
+    if norm is not None:
+        image /= norm
+    return image
+
+
+def mean_spectrum(counts, norm=None, mask=None, max_bytes=BLOCK_BYTES):
+    """The mean (normalized) spectrum of the pixels in *mask*
+
+    Parameters
+    ----------
+    counts : array or Dataset
+        Shape (ny, nx, n_bins), only the blocks of rows with a pixel in
+        *mask* are read
+
+    norm : array, optional
+        Shape (ny, nx), each spectrum is divided by this
+
+    mask : array of bool, optional
+        Shape (ny, nx), defaults to every pixel
+
+    max_bytes : int, optional
+        See `_row_blocks`
+
+    Returns
+    -------
+    ndarray
+        Shape (n_bins,), NaN if *mask* is empty
+    """
+    ny, nx, n_bins = counts.shape
+    if mask is None:
+        mask = np.ones((ny, nx), dtype=bool)
+    # only read the bounding box of the mask
+    (hit_rows,) = np.nonzero(mask.any(axis=1))
+    (hit_cols,) = np.nonzero(mask.any(axis=0))
+    total = np.zeros(n_bins)
+    if len(hit_rows):
+        rows_hit = slice(hit_rows[0], hit_rows[-1] + 1)
+        cols = slice(hit_cols[0], hit_cols[-1] + 1)
+        for rows in _row_blocks(counts, rows_hit, max_bytes):
+            selected = mask[rows, cols]
+            if norm is None:
+                weights = selected.astype(float)
+            else:
+                # only divide where selected, norm may be 0 outside the mask
+                weights = np.divide(
+                    1.0,
+                    norm[rows, cols],
+                    out=np.zeros(selected.shape),
+                    where=selected,
+                )
+            # a weighted sum rather than copying out the selected spectra
+            total += np.einsum("ij,ijk->k", weights, counts[rows, cols])
+    with np.errstate(invalid="ignore"):
+        return total / np.count_nonzero(mask)
+
+
+def pixel_spectrum(counts, norm, y_ind, x_ind):
+    """The (normalized) spectrum of one pixel, only that pixel is read"""
+    # always a copy, for float64 arrays indexing gives a view of counts
+    spectrum = np.array(counts[y_ind, x_ind, :], dtype=float)
+    if norm is not None:
+        spectrum /= norm[y_ind, x_ind]
+    return spectrum
+
+
+class PixelLocator:
+    def __init__(self, x_pos, y_pos, rtol=1e-3):
+        """Find the pixel nearest to a position
+
+        If the positions are a regular raster (to within *rtol* of the
+        spacing) the indices are computed directly, otherwise (for example
+        fly scans) a KD-tree of the positions is queried.  Either way the
+        cost does not grow with the size of the map.
+
+        Parameters
+        ----------
+        x_pos, y_pos : array
+            The position of each pixel, shape (ny, nx)
+
+        rtol : float, optional
+            How far, as a fraction of the spacing, positions may be from a
+            regular grid and still be treated as one
+        """
+        self.shape = x_pos.shape
+        ny, nx = self.shape
+        # a regular grid is set by its first pixel and the steps
+        self.x0, self.y0 = x_pos[0, 0], y_pos[0, 0]
+        self.dx = (x_pos[0, -1] - self.x0) / max(nx - 1, 1)
+        self.dy = (y_pos[-1, 0] - self.y0) / max(ny - 1, 1)
+        y_ind, x_ind = np.indices(self.shape)
+        self.regular = bool(
+            self.dx != 0
+            and self.dy != 0
+            and np.all(np.abs(x_pos - self.x0 - x_ind * self.dx) <= rtol * abs(self.dx))
+            and np.all(np.abs(y_pos - self.y0 - y_ind * self.dy) <= rtol * abs(self.dy))
+        )
+        self.tree = (
+            None
+            if self.regular
+            else cKDTree(np.transpose((np.ravel(x_pos), np.ravel(y_pos))))
+        )
+
+    def __repr__(self):
+        kind = "regular grid" if self.regular else "KD-tree"
+        return f"<PixelLocator {self.shape[0]}x{self.shape[1]} {kind}>"
+
+    def locate(self, x, y):
+        """The (y, x) index of the pixel nearest to (*x*, *y*)"""
+        if self.regular:
+            ny, nx = self.shape
+            x_ind = int(np.clip(np.rint((x - self.x0) / self.dx), 0, nx - 1))
+            y_ind = int(np.clip(np.rint((y - self.y0) / self.dy), 0, ny - 1))
+            return y_ind, x_ind
+        _, flat = self.tree.query((x, y))
+        y_ind, x_ind = np.unravel_index(flat, self.shape)
+        return int(y_ind), int(x_ind)
+
+    def contains(self, verts):
+        """The pixels inside of the polygon *verts*
+
+        Only the pixels in the bounding box of the polygon are considered.
+        On a regular grid the polygon is rasterized a row at a time,
+        otherwise the candidates are tested with `Path.contains_points`.
+        Both use the even-odd rule.
+
+        Parameters
+        ----------
+        verts : array
+            The (x, y) vertices of the polygon, shape (n, 2)
+
+        Returns
+        -------
+        ndarray of bool
+            Shape (ny, nx)
+        """
+        verts = np.asarray(verts, dtype=float)
+        mask = np.zeros(self.shape, dtype=bool)
+        if not self.regular:
+            x, y = self.tree.data.T
+            (x_min, y_min), (x_max, y_max) = verts.min(axis=0), verts.max(axis=0)
+            (candidates,) = np.nonzero(
+                (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)
+            )
+            inside = path.Path(verts).contains_points(self.tree.data[candidates])
+            mask.flat[candidates[inside]] = True
+            return mask
+
+        ny, nx = self.shape
+        # in index coordinates pixel [i, j] is at (j, i)
+        u = (verts[:, 0] - self.x0) / self.dx
+        v = (verts[:, 1] - self.y0) / self.dy
+        rows = np.arange(
+            max(int(np.ceil(v.min())), 0), min(int(np.floor(v.max())), ny - 1) + 1
+        )
+        if not len(rows):
+            return mask
+        # the edges (u0, v0) -> (u1, v1), closing the polygon
+        u0, v0, u1, v1 = u, v, np.roll(u, -1), np.roll(v, -1)
+        row_ind, edge_ind = np.nonzero((v0 <= rows[:, None]) != (v1 <= rows[:, None]))
+        t = (rows[row_ind] - v0[edge_ind]) / (v1[edge_ind] - v0[edge_ind])
+        crossing = u0[edge_ind] + t * (u1[edge_ind] - u0[edge_ind])
+        # every pixel to the right of a crossing toggles between in and out
+        first = np.clip(np.floor(crossing) + 1, 0, nx).astype(int)
+        toggles = np.zeros((len(rows), nx + 1), dtype=np.uint8)
+        np.add.at(toggles, (row_ind, first), 1)
+        mask[rows] = np.cumsum(toggles[:, :nx], axis=1) % 2 == 1
+        return mask
+
+
+class EnergyIndex:
+    def __init__(self, planes, edges, counts):
+        """Cumulative sums along energy for fast energy-ROI images
+
+        ``planes[i]`` is the sum of ``counts[:, :, :edges[i]]``, so the
+        image of an ROI between two edges is the difference of two planes.
+        If the edges are coarser than the bins the counts of the bins
+        between the ROI and the nearest edges are added from *counts*.
+        Use `build_energy_index` or `load_energy_index` to make one.
+
+        Parameters
+        ----------
+        planes : array or Dataset
+            Shape (len(edges), ny, nx)
+
+        edges : array of int
+            Increasing bin numbers from 0 to n_bins
+
+        counts : array or Dataset
+            The spectra the index was built from, shape (ny, nx, n_bins)
+        """
+        self.planes = planes
+        self.edges = np.asarray(edges)
+        self.counts = counts
+
+    def __repr__(self):
+        return (
+            f"<EnergyIndex {len(self.edges)} planes of {self.planes.dtype}, "
+            f"{self.counts.shape[2]} bins>"
+        )
+
+    def roi_sum(self, vmin, vmax):
+        """The sum of ``counts[:, :, vmin:vmax]``, see `sum_image`"""
+        n_bins = self.counts.shape[2]
+        vmin, vmax = np.clip([vmin, vmax], 0, n_bins)
+        if vmax <= vmin:
+            return np.zeros(self.counts.shape[:2])
+        # the first and last edges inside of the ROI
+        i = np.searchsorted(self.edges, vmin, side="left")
+        j = np.searchsorted(self.edges, vmax, side="right") - 1
+        if i > j:
+            # within one coarse bin
+            return sum_image(self.counts, roi=slice(vmin, vmax))
+        image = self.planes[j].astype(float) - self.planes[i]
+        lo, hi = self.edges[i], self.edges[j]
+        if vmin < lo:
+            image += sum_image(self.counts, roi=slice(vmin, lo))
+        if hi < vmax:
+            image += sum_image(self.counts, roi=slice(hi, vmax))
+        return image
+
+
+def build_energy_index(counts, max_bytes=None, fname=None):
+    """Compute the cumulative sums along energy of *counts*
+
+    Integer counts are accumulated in the smallest unsigned type that holds
+    the total of every pixel, anything else in float64.
+
+    Parameters
+    ----------
+    counts : array or Dataset
+        Shape (ny, nx, n_bins), read a block of rows at a time
+
+    max_bytes : int, optional
+        The most memory (or disk) the planes may use.  If a plane for every
+        bin does not fit, planes are only kept every few bins.
+
+    fname : str, optional
+        If given the planes are written to this HDF5 file (which is
+        overwritten) rather than kept in memory
+
+    Returns
+    -------
+    EnergyIndex
+    """
+    ny, nx, n_bins = counts.shape
+    if np.issubdtype(counts.dtype, np.integer):
+        total = int(sum_image(counts).max())
+        dtype = np.result_type(np.min_scalar_type(total), np.uint8)
+    else:
+        dtype = np.dtype(float)
+    step = 1
+    if max_bytes is not None:
+        n_planes = max(max_bytes // (ny * nx * dtype.itemsize), 2)
+        step = -(-n_bins // (n_planes - 1))
+    edges = np.append(np.arange(0, n_bins, step), n_bins)
+
+    shape = (len(edges), ny, nx)
+    if fname is None:
+        planes = np.empty(shape, dtype=dtype)
+    else:
+        h5 = h5py.File(fname, "w")
+        h5["edges"] = edges
+        planes = h5.create_dataset("planes", shape, dtype=dtype, chunks=(1, ny, nx))
+    planes[0] = 0
+    for rows in _row_blocks(counts):
+        coarse = np.add.reduceat(counts[rows], edges[:-1], axis=2, dtype=dtype)
+        planes[1:, rows, :] = np.cumsum(coarse, axis=2, dtype=dtype).transpose(2, 0, 1)
+    return EnergyIndex(planes, edges, counts)
+
+
+def load_energy_index(fname, counts):
+    """Open an index written by `build_energy_index`, the planes are not loaded"""
+    h5 = h5py.File(fname, "r")
+    planes, edges = h5["planes"], h5["edges"][:]
+    if planes.shape[1:] != counts.shape[:2] or edges[-1] != counts.shape[2]:
+        h5.close()
+        raise ValueError(
+            f"The index in {fname!r} does not match counts of shape {counts.shape}"
+        )
+    return EnergyIndex(planes, edges, counts)
+
 
 class XRFInteract(object):
-    def __init__(self, counts, positions, fig=None, pos_order=None, norm=None):
+    def __init__(
+        self,
+        counts,
+        positions,
+        fig=None,
+        pos_order=None,
+        norm=None,
+        recorder=None,
+        energy_index=None,
+        hover=False,
+    ):
+        """Explore an XRF map and its spectra
+
+        Parameters
+        ----------
+        counts : array or Dataset
+            The spectra, shape (ny, nx, n_bins).  Kept as is (raw counts
+            in their own type, an h5py Dataset is not read into memory),
+            the reductions read a block at a time as needed and apply
+            *norm* to the results, see `sum_image` and `mean_spectrum`.
+
+        positions : array
+            The x and y position of each pixel, shape (2, ny, nx)
+
+        fig : Figure, optional
+            The figure to use, one is created if not given
+
+        pos_order : dict, optional
+            Which of *positions* is 'x' and 'y', defaults to {'x': 0, 'y': 1}
+
+        norm : array, optional
+            Per-pixel normalization (for example the incident flux),
+            shape (ny, nx)
+
+        recorder : LatencyRecorder, optional
+            If given, the time spent in each phase of the callbacks is
+            recorded to it.  Anything with ``watch(figure)``, ``event(name)``
+            and ``phase(name)`` methods will do, for example
+            ``temperature_utils.LatencyRecorder``.
+
+        energy_index : EnergyIndex or bool, optional
+            Used to compute the image of an energy ROI from two planes
+            rather than summing over the ROI.  If True, a full index is
+            built in memory, see `build_energy_index` for on disk or
+            memory bounded ones.
+
+        hover : bool, optional
+            Preview the spectrum of the pixel under the mouse
+        """
+        # optional timing of the callbacks
+        self.recorder = recorder
 
         if pos_order is None:
             pos_order = {"x": 0, "y": 1}
         # extract x/y data
         self.x_pos = xpos = positions[pos_order["x"]]
         self.y_pos = ypos = positions[pos_order["y"]]
-        self.points = np.transpose((xpos.ravel(), ypos.ravel()))
-        # sort ouf the normalization
-        if norm is None:
-            norm = np.ones_like(self.x_pos)
-
-        norm = np.atleast_3d(norm[:])
-        self.counts = counts[:] / norm
+        self.locator = PixelLocator(xpos, ypos)
+        # rather than keeping a normalized copy of the counts, normalize
+        # the images and spectra computed from them
+        self.counts = counts
+        self.norm = None if norm is None else np.asarray(norm[:], dtype=float)
+        if energy_index is True:
+            energy_index = build_energy_index(self.counts)
+        self.energy_index = energy_index or None
 
         # compute values we will use for extents below
         dx = np.diff(xpos.mean(axis=0)).mean()
@@ -46,8 +442,11 @@ class XRFInteract(object):
             # clear the figure
             fig.clf()
         # set the window title (look at the tool bar)
-        fig.canvas.set_window_title("XRF map")
+        if fig.canvas.manager is not None:
+            fig.canvas.manager.set_window_title("XRF map")
         self.fig = fig
+        if recorder is not None:
+            recorder.watch(fig)
         # set up the figure layout
         gs = gridspec.GridSpec(2, 1, height_ratios=[4, 1], figure=fig)
 
@@ -86,7 +485,7 @@ class XRFInteract(object):
 
         # show the initial image
         self.im = self.ax_im.imshow(
-            self.counts[:, :, :].sum(axis=2),
+            sum_image(self.counts, self.norm),
             cmap="viridis",
             interpolation="nearest",
             extent=[left, right, bot, top],
@@ -112,7 +511,7 @@ class XRFInteract(object):
             markeredgecolor="red",
         )
         # set up the spectrum, to start average everything
-        (self.spec,) = self.ax_spec.plot(self.counts.mean(axis=(0, 1)), lw=2)
+        (self.spec,) = self.ax_spec.plot(mean_spectrum(self.counts, self.norm), lw=2)
 
         # set up the selector widget for the specturm
         self.selector = mwidgets.SpanSelector(
@@ -121,12 +520,32 @@ class XRFInteract(object):
             "horizontal",
             useblit=True,
             minspan=2,
-            span_stays=True,
+            interactive=True,
         )
         # placeholder for the lasso selector
         self.lasso = None
         # hook up the mouse events for the XRF map
         self.cid = self.fig.canvas.mpl_connect("button_press_event", self._on_click)
+        # the spectrum of the pixel under the mouse
+        (self.preview,) = self.ax_spec.plot([], [], lw=1, ls="--", color="gray")
+        self._hover_pixel = None
+        self.hover_cid = None
+        if hover:
+            self.hover_cid = self.fig.canvas.mpl_connect(
+                "motion_notify_event", self._on_hover
+            )
+
+    def _event(self, name):
+        """Record the time of a callback if there is a recorder"""
+        return nullcontext() if self.recorder is None else self.recorder.event(name)
+
+    def _phase(self, name):
+        """Record the time of a phase of a callback if there is a recorder"""
+        return nullcontext() if self.recorder is None else self.recorder.phase(name)
+
+    def _redraw(self):
+        with self._phase("draw_request"):
+            self.fig.canvas.draw_idle()
 
     @property
     def _overlay_image(self):
@@ -154,49 +573,81 @@ class XRFInteract(object):
         if event.key == "shift":
             return self._pixel_select(event)
 
+    def _on_hover(self, event):
+        ax = event.inaxes
+        # not over the map, or dragging (a lasso or span)
+        if ax is None or ax.get_gid() != "imgmap" or event.button is not None:
+            pixel = None
+        else:
+            pixel = self.locator.locate(event.xdata, event.ydata)
+        if pixel == self._hover_pixel:
+            return
+        self._hover_pixel = pixel
+        with self._event("hover"):
+            if pixel is None:
+                self.preview.set_data([], [])
+            else:
+                with self._phase("extract"):
+                    new_y_data = pixel_spectrum(self.counts, self.norm, *pixel)
+                with self._phase("plot"):
+                    self.preview.set_data(np.arange(len(new_y_data)), new_y_data)
+            self._redraw()
+
     def _reset_spectrum(self):
-        self.mask = np.ones(self.x_pos.shape, dtype="bool")
-        self.mask_im.set_data(self._overlay_image)
-        new_y_data = self.counts.mean(axis=(0, 1))
-        self.spec.set_ydata(new_y_data)
-        self._pixel_txt.set_text("map average")
-        self.ax_spec.relim()
-        self.ax_spec.autoscale(True, axis="y")
-        self.fig.canvas.draw_idle()
+        with self._event("reset"):
+            with self._phase("extract"):
+                self.mask = np.ones(self.x_pos.shape, dtype="bool")
+                new_y_data = mean_spectrum(self.counts, self.norm)
+            with self._phase("plot"):
+                self.mask_im.set_data(self._overlay_image)
+                self.spec.set_ydata(new_y_data)
+                self._pixel_txt.set_text("map average")
+                self.ax_spec.relim()
+                self.ax_spec.autoscale(True, axis="y")
+            self._redraw()
 
     def _pixel_select(self, event):
-
-        x, y = event.xdata, event.ydata
-        self.overlay_plot.set_data([x], [y])
-        # get index by assuming even spacing
-        # TODO use kdtree?
-        diff = np.hypot((self.x_pos - x), (self.y_pos - y))
-        y_ind, x_ind = np.unravel_index(np.argmin(diff), diff.shape)
-
-        # get the spectrum for this point
-        new_y_data = self.counts[y_ind, x_ind, :]
-        self.mask = np.zeros(self.x_pos.shape, dtype="bool")
-        # self.mask[y_ind, x_ind] = True
-        self.mask_im.set_data(self._overlay_image)
-        self._pixel_txt.set_text(
-            "pixel: [{:d}, {:d}] ({:.3g}, {:.3g})".format(
-                y_ind, x_ind, self.x_pos[y_ind, x_ind], self.y_pos[y_ind, x_ind]
-            )
-        )
-
-        self.spec.set_ydata(new_y_data)
-        self.ax_spec.relim()
-        self.ax_spec.autoscale(True, axis="y")
-        self.fig.canvas.draw_idle()
+        with self._event("pixel"):
+            x, y = event.xdata, event.ydata
+            with self._phase("lookup"):
+                y_ind, x_ind = self.locator.locate(x, y)
+
+            with self._phase("extract"):
+                # get the spectrum for this point
+                new_y_data = pixel_spectrum(self.counts, self.norm, y_ind, x_ind)
+                self.mask = np.zeros(self.x_pos.shape, dtype="bool")
+                # self.mask[y_ind, x_ind] = True
+
+            with self._phase("plot"):
+                self.overlay_plot.set_data([x], [y])
+                self.mask_im.set_data(self._overlay_image)
+                self._pixel_txt.set_text(
+                    "pixel: [{:d}, {:d}] ({:.3g}, {:.3g})".format(
+                        y_ind, x_ind, self.x_pos[y_ind, x_ind], self.y_pos[y_ind, x_ind]
+                    )
+                )
+
+                self.spec.set_ydata(new_y_data)
+                self.ax_spec.relim()
+                self.ax_spec.autoscale(True, axis="y")
+            self._redraw()
 
     def _on_span(self, vmin, vmax):
-        vmin, vmax = map(int, (vmin, vmax))
-        new_image = self.counts[:, :, vmin:vmax].sum(axis=2)
-        new_max = new_image.max()
-        self._EROI_txt.set_text("ROI: {}:{}".format(vmin, vmax))
-        self.im.set_data(new_image)
-        self.im.set_clim(0, new_max)
-        self.fig.canvas.draw_idle()
+        with self._event("span"):
+            vmin, vmax = map(int, (vmin, vmax))
+            with self._phase("extract"):
+                if self.energy_index is None:
+                    new_image = sum_image(self.counts, self.norm, slice(vmin, vmax))
+                else:
+                    new_image = self.energy_index.roi_sum(vmin, vmax)
+                    if self.norm is not None:
+                        new_image /= self.norm
+                new_max = new_image.max()
+            with self._phase("plot"):
+                self._EROI_txt.set_text("ROI: {}:{}".format(vmin, vmax))
+                self.im.set_data(new_image)
+                self.im.set_clim(0, new_max)
+            self._redraw()
 
     def _lasso_on_press(self, event):
         self.lasso = mwidgets.Lasso(
@@ -204,25 +655,28 @@ class XRFInteract(object):
         )
 
     def _lasso_call_back(self, verts):
-        p = path.Path(verts)
-
-        new_mask = p.contains_points(self.points).reshape(*self.x_pos.shape)
-        self.mask = new_mask
-        self.mask_im.set_data(self._overlay_image)
-        new_y_data = self.counts[new_mask].mean(axis=0)
-        self._pixel_txt.set_text("lasso mask")
-        self.spec.set_ydata(new_y_data)
-        self.ax_spec.relim()
-        self.ax_spec.autoscale(True, axis="y")
-        self.fig.canvas.draw_idle()
+        with self._event("lasso"):
+            with self._phase("lookup"):
+                new_mask = self.locator.contains(verts)
+                self.mask = new_mask
+            with self._phase("extract"):
+                new_y_data = mean_spectrum(self.counts, self.norm, new_mask)
+            with self._phase("plot"):
+                self.mask_im.set_data(self._overlay_image)
+                self._pixel_txt.set_text("lasso mask")
+                self.spec.set_ydata(new_y_data)
+                self.ax_spec.relim()
+                self.ax_spec.autoscale(True, axis="y")
+            self._redraw()
 
 
 def show_xrf(fn, fig=None):
     F = h5py.File(fn, "r")
     g = F["xrfmap"]
 
+    # the spectra are read as needed rather than loaded up front
     xrf = XRFInteract(
-        g["detsum"]["counts"][:],
+        g["detsum"]["counts"],
         g["positions"]["pos"][:],
         norm=g["scalers"]["val"][:, :, 0],
         fig=fig,